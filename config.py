@@ -1,5 +1,7 @@
 # config.py - Configuración del Sistema RRHH OPTIMIZADA
 import os
+import threading
+from typing import Optional
 
 # ===============================================
 # 🔗 CONFIGURACIÓN SUPABASE (SANCIONES)
@@ -10,11 +12,64 @@ SUPABASE_KEY = "eyJhbGciOiJIUzI1NiIsInR5cCI6IkpXVCJ9.eyJpc3MiOiJzdXBhYmFzZSIsInJ
 # ===============================================
 # 💾 BASE DE DATOS LOCAL
 # ===============================================
-DB_LOCAL = r"\\SERVER\Respaldo 2017\Base\procesadas.db"
+DB_DIRECTORIO_RED = r"\\SERVER\Respaldo 2017\Base"
+DB_RED = r"\\SERVER\Respaldo 2017\Base\procesadas.db"
+# Si no existe el directorio (o no responde a tiempo), usar ruta local
+DB_LOCAL_RESPALDO = "procesadas.db"
+# Máximo de segundos esperando a que el servidor responda si el directorio existe
+DB_RESOLUCION_TIMEOUT = 3.0
 
-# Si no existe el directorio, usar ruta local
-if not os.path.exists(r"\\SERVER\Respaldo 2017\Base"):
-    DB_LOCAL = "procesadas.db"
+_db_local_resuelta = None
+_db_motivo_respaldo = None
+
+def resolver_db_local(timeout: float = DB_RESOLUCION_TIMEOUT) -> str:
+    """
+    💾 Ruta de la base local: la del servidor si responde dentro de `timeout`, si no la local.
+    Se resuelve una sola vez (al primer uso, no al importar): os.path.exists sobre una ruta
+    UNC puede bloquear muchos segundos con el servidor lento.
+    """
+    global _db_local_resuelta, _db_motivo_respaldo
+    if _db_local_resuelta is not None:
+        return _db_local_resuelta
+
+    resultado = {}
+    hilo = threading.Thread(
+        target=lambda: resultado.update(existe=os.path.exists(DB_DIRECTORIO_RED)),
+        daemon=True
+    )
+    hilo.start()
+    hilo.join(timeout)
+
+    if resultado.get('existe'):
+        _db_local_resuelta = DB_RED
+    else:
+        if hilo.is_alive():
+            _db_motivo_respaldo = f"{DB_DIRECTORIO_RED} no respondió en {timeout}s"
+        else:
+            _db_motivo_respaldo = f"{DB_DIRECTORIO_RED} no está disponible"
+        print(f"⚠️ {_db_motivo_respaldo} - usando base local")
+        _db_local_resuelta = DB_LOCAL_RESPALDO
+    return _db_local_resuelta
+
+def aviso_db_respaldo() -> Optional[str]:
+    """⚠️ Texto para el operador si se usa la base local de respaldo en lugar de la compartida"""
+    if _db_motivo_respaldo is None:
+        return None
+    return (f"Base NO compartida: {os.path.abspath(_db_local_resuelta)} "
+            f"({_db_motivo_respaldo})")
+
+# Ajustes de conexión SQLite para una base en recurso de red (SMB)
+# busy_timeout: esperar bloqueos de otras estaciones en lugar de fallar al instante
+SQLITE_BUSY_TIMEOUT_MS = 10000
+# NORMAL: menos fsync por commit (cada fsync es un viaje de red)
+SQLITE_SYNCHRONOUS = "NORMAL"
+# Caché de páginas por conexión (KB)
+SQLITE_CACHE_KB = 8192
+# Tablas temporales e índices de ordenamiento en memoria local
+SQLITE_TEMP_STORE = "MEMORY"
+# Escritura diferida del historial local: volcar cada N filas o cada T milisegundos
+ESCRITURA_LOTE_FILAS = 200
+ESCRITURA_INTERVALO_MS = 500
 
 # ===============================================
 # 📂 CATEGORÍAS DE SANCIONES
@@ -43,20 +98,88 @@ USUARIOS_DEFAULT = {
 # ===============================================
 # Tamaño de lotes para procesamiento
 BATCH_SIZE = 50
-# Timeout para requests (segundos)
+# Timeout para requests (segundos): lectura de la respuesta
 REQUEST_TIMEOUT = 10
+# Timeout para establecer la conexión TCP+TLS (segundos)
+TIMEOUT_CONEXION = 3.05
 # Máximo de reintentos
 MAX_REINTENTOS = 3
+# Backoff exponencial con jitter: espera base y espera máxima entre reintentos (segundos)
+REINTENTO_ESPERA_BASE = 0.5
+REINTENTO_ESPERA_MAX = 8.0
+# Estados HTTP transitorios que se reintentan
+REINTENTO_ESTADOS = (429, 500, 502, 503, 504)
+# Plazo total de un procesamiento masivo, reintentos incluidos (segundos)
+PLAZO_PROCESAMIENTO = 300
 # Threads para procesamiento paralelo
 MAX_THREADS = 5
+# Modo bulk: un solo PATCH por lote (id=in.(...)) en lugar de uno por sanción
+MODO_BULK = True
+# Ids por consulta al validar disponibilidad (mantiene la URL de id=in.(...) en pocos KB)
+VALIDACION_LOTE_IDS = 100
+# GET de validación previo al procesamiento (opcional: el PATCH condicional ya impide procesar dos veces)
+VALIDAR_ANTES_DE_PROCESAR = False
+# Filas por página al consultar sanciones pendientes (paginación keyset)
+PAGINA_PENDIENTES = 500
+# Filas por página al sincronizar el espejo local de sanciones
+PAGINA_SINCRONIZACION = 1000
+# Filas por página del historial (pestañas H- y exportaciones)
+PAGINA_HISTORIAL = 200
+# Filas por página al exportar el historial completo desde Supabase
+PAGINA_EXPORTACION = 1000
+# Ids por consulta IN al enriquecer con el historial local (límite de parámetros de SQLite: 999)
+ENRIQUECER_LOTE_IDS = 500
+
+# ===============================================
+# 🎚️ CONCURRENCIA ADAPTATIVA (AIMD)
+# ===============================================
+# Peticiones simultáneas al empezar a procesar (y límites del controlador)
+CONCURRENCIA_INICIAL = MAX_THREADS
+CONCURRENCIA_MIN = 1
+CONCURRENCIA_MAX = 12
+# Latencia de un PATCH por encima de la cual se considera que Supabase está saturado (segundos)
+CONCURRENCIA_LATENCIA_OBJETIVO = 2.0
+# Factor de reducción ante 429, 5xx, errores de red o latencia alta
+CONCURRENCIA_FACTOR_REDUCCION = 0.5
+# Tiempo mínimo entre dos reducciones (una ráfaga de errores cuenta como un solo evento)
+CONCURRENCIA_ENFRIAMIENTO = 1.0
+# Filas mínimas por PATCH en modo bulk al repartir una selección pequeña entre varios hilos
+BLOQUE_BULK_MINIMO = 10
+
+# ===============================================
+# 🪣 LIMITADOR DE TASA (TOKEN BUCKET)
+# ===============================================
+# Presupuesto de peticiones por segundo de ESTA estación hacia Supabase (0 = sin límite).
+# Para no pasar el límite del proyecto: límite del proyecto / estaciones procesando a la vez.
+TASA_LECTURAS_POR_SEGUNDO = 20
+TASA_ESCRITURAS_POR_SEGUNDO = 10
+# Ráfaga máxima (tokens acumulables estando inactivo)
+RAFAGA_LECTURAS = 20
+RAFAGA_ESCRITURAS = 10
+
+# ===============================================
+# 🌐 CONFIGURACIÓN HTTP (POOL DE SESIONES)
+# ===============================================
+# Sesiones HTTP reutilizables (una por hilo trabajando a la vez)
+HTTP_SESIONES = CONCURRENCIA_MAX + 1
+# Conexiones keep-alive por sesión hacia el host de Supabase
+HTTP_CONEXIONES_POR_SESION = 2
+# Abrir conexiones (TCP+TLS) en segundo plano al iniciar
+HTTP_PRECALENTAR = True
+# Sesiones precalentadas a la vez (las demás quedan libres para peticiones reales)
+HTTP_PRECALENTAR_SIMULTANEAS = 2
 
 # ===============================================
 # 🔒 CONFIGURACIÓN DE CONCURRENCIA
 # ===============================================
 # Tiempo de bloqueo para evitar procesamiento duplicado (minutos)
 TIEMPO_BLOQUEO = 5
-# Intervalo de verificación de estado (segundos)
+# Intervalo de verificación de estado (segundos): conexión y reenvío del outbox
 INTERVALO_VERIFICACION = 30
+# Estados HTTP que indican Supabase fuera de servicio (la escritura se guarda en el outbox)
+ESTADOS_SIN_SERVICIO = (502, 503, 504)
+# Respuestas fallidas (con conexión) tras las que una escritura sale del outbox y vuelve a pendientes
+OUTBOX_MAX_INTENTOS = 5
 # Campos que indican procesamiento
 CAMPO_PROCESADO = 'comentarios_rrhh'
 VALOR_PENDIENTE = None  # NULL indica pendiente
@@ -76,6 +199,13 @@ COLOR_ERROR = "#C73E1D"
 COLOR_PROCESANDO = "#17a2b8"
 COLOR_BLOQUEADO = "#ffc107"
 
+# Tabla de sanciones virtualizada: alto de cada fila en píxeles (incluye separación)
+ALTO_FILA = 37
+# Espera tras la última tecla antes de aplicar la búsqueda (ms)
+BUSQUEDA_DEBOUNCE_MS = 250
+# Cuadros por segundo con que el hilo de Tk aplica las actualizaciones de los hilos de trabajo
+UI_FPS = 20
+
 # ===============================================
 # 📝 MENSAJES DEL SISTEMA
 # ===============================================
@@ -84,6 +214,8 @@ MSG_LOGIN_ERROR = "Usuario o contraseña incorrectos"
 MSG_CONEXION_ERROR = "Error de conexión con Supabase"
 MSG_DB_ERROR = "Error con base de datos local"
 MSG_CONCURRENCIA = "Sanción siendo procesada por otro usuario"
+MSG_EN_COLA = "Sin conexión: guardada para enviar al reconectar"
+MSG_RESULTADO_DESCONOCIDO = "Respuesta sin cuerpo: no se pudo confirmar el procesamiento"
 MSG_PROCESAMIENTO = "Procesando sanciones en lote..."
 MSG_VALIDANDO = "Validando disponibilidad..."
 
@@ -95,7 +227,7 @@ QUERY_PENDIENTES = {
     'select': '*',
     'status': 'eq.aprobado',
     'comentarios_rrhh': 'is.null',
-    'order': 'fecha.desc'
+    'order': 'fecha.desc,id.desc'
 }
 
 # Query para verificar concurrencia
@@ -110,7 +242,16 @@ LOG_LEVEL = "INFO"
 LOG_FILE = "rrhh_sistema.log"
 LOG_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
 
-print(f"✅ Configuración cargada - {TITULO_APP} {VERSION}")
-print(f"🔗 URL Supabase: {SUPABASE_URL[:30]}...")
-print(f"💾 Base local: {DB_LOCAL}")
-print(f"⚡ Optimizaciones: Batch({BATCH_SIZE}), Threads({MAX_THREADS}), Timeout({REQUEST_TIMEOUT}s)")
+# ===============================================
+# 🚀 CONFIGURACIÓN DE INICIO
+# ===============================================
+# Crear el procesador (ruta de la base, migraciones, pool HTTP) en segundo plano
+# mientras se pinta el login; se espera recién en el primer uso
+INICIO_DIFERIDO = True
+
+def mostrar_configuracion(db_local: str):
+    """Resumen de configuración en consola (una vez resuelta la base local)"""
+    print(f"✅ Configuración cargada - {TITULO_APP} {VERSION}")
+    print(f"🔗 URL Supabase: {SUPABASE_URL[:30]}...")
+    print(f"💾 Base local: {db_local}")
+    print(f"⚡ Optimizaciones: Batch({BATCH_SIZE}), Threads({MAX_THREADS}), Timeout({REQUEST_TIMEOUT}s)")
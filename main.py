@@ -5,9 +5,58 @@ import threading
 import os
 import queue
 import time
+INICIO_APLICACION = time.time()  # ⏱️ Referencia para medir el tiempo de arranque
 from datetime import datetime
 from config import *
-from procesador import procesador
+from procesador import procesador, IndiceSanciones, SeguimientoProgreso
+
+class DespachadorUI:
+    """
+    🧵 NUEVO: Puente thread-safe entre los hilos de trabajo y Tk
+    Los hilos publican sin bloquear; el hilo de Tk vacía la cola a UI_FPS cuadros por segundo.
+    Las publicaciones con canal se fusionan: por cuadro solo se aplica la última de cada canal.
+    """
+    def __init__(self, root, cola=None, fps=UI_FPS):
+        self.root = root
+        self.cola = cola if cola is not None else queue.Queue()
+        self.intervalo_ms = max(1, int(1000 / fps))
+        self._activo = True
+        self.root.after(self.intervalo_ms, self._drenar)
+    
+    def publicar(self, funcion, *args, canal=None):
+        """Ejecutar funcion(*args) en el hilo de Tk (se puede llamar desde cualquier hilo)"""
+        self.cola.put((canal, funcion, args))
+    
+    def detener(self):
+        self._activo = False
+    
+    def _drenar(self):
+        """Aplicar lo publicado desde el último cuadro (hilo de Tk)"""
+        if not self._activo:
+            return
+        
+        eventos = []
+        por_canal = {}  # canal -> posición en eventos (se reemplaza por el estado más reciente)
+        try:
+            while True:
+                canal, funcion, args = self.cola.get_nowait()
+                if canal is None:
+                    eventos.append((funcion, args))
+                elif canal in por_canal:
+                    eventos[por_canal[canal]] = (funcion, args)
+                else:
+                    por_canal[canal] = len(eventos)
+                    eventos.append((funcion, args))
+        except queue.Empty:
+            pass
+        
+        for funcion, args in eventos:
+            try:
+                funcion(*args)
+            except Exception as e:
+                print(f"⚠️ Error actualizando UI: {e}")
+        
+        self.root.after(self.intervalo_ms, self._drenar)
 
 class LoginWindow:
     def __init__(self, on_login_success):
@@ -16,6 +65,7 @@ class LoginWindow:
     
     def create_login_window(self):
         self.root = tk.Tk()
+        self.despachador = DespachadorUI(self.root)
         self.root.title("Login - Sistema RRHH")
         self.root.geometry("450x350")
         self.root.resizable(False, False)
@@ -128,9 +178,30 @@ class LoginWindow:
         # Focus inicial
         self.usuario_entry.focus()
         
+        # ⏱️ Medir cuánto tardó el login en quedar visible
+        self.root.after_idle(self._registrar_arranque)
+        
         # Iniciar loop
         self.root.mainloop()
     
+    def _registrar_arranque(self):
+        estado = "listo" if procesador.listo else "inicializando en segundo plano"
+        print(f"⏱️ Login visible en {time.time() - INICIO_APLICACION:.2f}s (procesador {estado})")
+        
+        # ⚠️ Avisar en cuanto se sepa si se está usando la base local de respaldo
+        def avisar_thread():
+            try:
+                aviso = procesador.esperar().aviso_db
+            except Exception:
+                return  # El error de inicio se muestra al validar el login
+            if aviso:
+                self.despachador.publicar(lambda: self.status_label.config(text=f"⚠️ {aviso}", fg=COLOR_ERROR,
+                                                                           wraplength=380))
+        
+        thread = threading.Thread(target=avisar_thread)
+        thread.daemon = True
+        thread.start()
+    
     def login(self):
         usuario = self.usuario_entry.get().strip()
         password = self.password_entry.get().strip()
@@ -144,12 +215,21 @@ class LoginWindow:
         
         # Validar en hilo separado para no bloquear UI
         def validar_thread():
+            if not procesador.listo:
+                self.despachador.publicar(lambda: self.status_label.config(text="⏳ Preparando base de datos...", fg='blue'))
+            try:
+                procesador.esperar()
+            except Exception as e:
+                # Base local inaccesible o migración fallida durante el inicio en segundo plano
+                self.despachador.publicar(lambda: self.status_label.config(text=f"❌ {MSG_DB_ERROR}", fg=COLOR_ERROR))
+                self.despachador.publicar(messagebox.showerror, "Error", f"{MSG_DB_ERROR}:\n{e}")
+                return
             if procesador.validar_usuario(usuario, password):
-                self.root.after(0, lambda: self.success_login(usuario))
+                self.despachador.publicar(self.success_login, usuario)
             else:
-                self.root.after(0, lambda: self.status_label.config(text="❌ Usuario o contraseña incorrectos", fg=COLOR_ERROR))
-                self.root.after(0, lambda: self.password_entry.delete(0, tk.END))
-                self.root.after(0, lambda: self.password_entry.focus())
+                self.despachador.publicar(lambda: self.status_label.config(text="❌ Usuario o contraseña incorrectos", fg=COLOR_ERROR))
+                self.despachador.publicar(lambda: self.password_entry.delete(0, tk.END))
+                self.despachador.publicar(lambda: self.password_entry.focus())
         
         thread = threading.Thread(target=validar_thread)
         thread.daemon = True
@@ -161,6 +241,7 @@ class LoginWindow:
         self.root.after(500, lambda: self._complete_login(usuario))
     
     def _complete_login(self, usuario):
+        self.despachador.detener()
         self.root.destroy()
         self.on_login_success(usuario)
 
@@ -240,26 +321,128 @@ class ProgressWindow:
         self.detail_var.set("Preparando sistema...")
     
     def update_progress(self, main_text, detail_text=""):
-        """Actualizar progreso desde hilo de trabajo"""
+        """Actualizar progreso (hilo de Tk: los hilos de trabajo lo publican vía DespachadorUI)"""
         if self.window and self.window.winfo_exists():
             self.progress_var.set(main_text)
             self.detail_var.set(detail_text)
             self.window.update_idletasks()
     
+    def crear_seguimiento(self, despachador, total=None):
+        """📊 NUEVO: Seguimiento cuyos registros (desde cualquier hilo) repintan esta ventana vía despachador"""
+        return SeguimientoProgreso(
+            total=total,
+            al_cambiar=lambda seguimiento: despachador.publicar(self.mostrar_seguimiento, seguimiento, canal=self)
+        )
+    
+    def mostrar_seguimiento(self, seguimiento):
+        """📊 NUEVO: Barra determinada + filas/s, p50/p95 y ETA (hilo de Tk)"""
+        if not (self.window and self.window.winfo_exists()):
+            return
+        
+        r = seguimiento.resumen()
+        if r['fraccion'] is not None:
+            if str(self.progress['mode']) != 'determinate':
+                self.progress.stop()
+                self.progress.configure(mode='determinate', maximum=100)
+            self.progress['value'] = r['fraccion'] * 100
+            principal = f"{r['completadas']}/{r['total']} ({r['fraccion']:.0%})"
+        else:
+            principal = f"{r['completadas']} registros"
+        
+        metricas = [f"⚡ {r['filas_por_segundo']:.1f} filas/s"]
+        if r['p50'] is not None:
+            metricas.append(f"p50 {r['p50'] * 1000:.0f} ms | p95 {r['p95'] * 1000:.0f} ms")
+        if r['eta'] is not None:
+            metricas.append(f"⏳ ETA {r['eta']:.0f}s")
+        detalle = " | ".join(metricas)
+        detalle += f"\n✅ {r['exitosas']}  ❌ {r['fallidas']}  🔒 {r['conflictos']}"
+        if r['concurrencia'] is not None:
+            detalle += f"  🎚️ {r['concurrencia']} en paralelo"
+        
+        self.update_progress(principal, detalle)
+    
     def close(self):
         """Cerrar ventana de progreso"""
         if self.window and self.window.winfo_exists():
             self.progress.stop()
             self.window.destroy()
 
+class ModeloSeleccion:
+    """
+    ☑️ NUEVO: Modelo de selección de una pestaña (conjunto de ids)
+    Cada operación notifica a los observadores una sola vez con los ids que cambiaron.
+    """
+    def __init__(self):
+        self._ids = set()
+        self._observadores = []
+    
+    def suscribir(self, callback):
+        """Registrar callback(ids_cambiados) que se llama tras cada cambio"""
+        self._observadores.append(callback)
+    
+    def __contains__(self, id_sancion):
+        return id_sancion in self._ids
+    
+    def __len__(self):
+        return len(self._ids)
+    
+    def seleccionar(self, id_sancion, seleccionada=True):
+        """Marcar o desmarcar un id"""
+        if seleccionada == (id_sancion in self._ids):
+            return
+        
+        if seleccionada:
+            self._ids.add(id_sancion)
+        else:
+            self._ids.discard(id_sancion)
+        self._notificar({id_sancion})
+    
+    def seleccionar_varios(self, ids):
+        """Agregar varios ids a la selección (una sola notificación)"""
+        nuevos = set(ids) - self._ids
+        if nuevos:
+            self._ids |= nuevos
+            self._notificar(nuevos)
+    
+    def limpiar(self):
+        """Quitar toda la selección"""
+        if self._ids:
+            cambiados, self._ids = self._ids, set()
+            self._notificar(cambiados)
+    
+    def quitar(self, ids):
+        """Olvidar ids que ya no están en la pestaña"""
+        quitados = self._ids & set(ids)
+        if quitados:
+            self._ids -= quitados
+            self._notificar(quitados)
+    
+    def invertir(self, ids):
+        """Invertir la selección dentro del universo de ids dado"""
+        universo = set(ids)
+        if universo:
+            self._ids ^= universo
+            self._notificar(universo)
+    
+    def _notificar(self, cambiados):
+        for callback in self._observadores:
+            callback(cambiados)
+
+
 class SancionCheckbox:
-    """Clase para manejar checkbox de cada sanción - OPTIMIZADA"""
-    def __init__(self, sancion, parent_frame, row, on_selection_change, show_procesado=False):
-        self.sancion = sancion
+    """
+    Clase para manejar checkbox de cada sanción - OPTIMIZADA
+    ⚡ VIRTUALIZADA: los widgets se crean una sola vez y se reasignan a otra sanción al hacer scroll
+    """
+    def __init__(self, parent_frame, on_selection_change, show_procesado=False, on_range_select=None):
+        self.sancion = None
         self.parent_frame = parent_frame
-        self.row = row
+        self.row = -1
         self.on_selection_change = on_selection_change
+        self.on_range_select = on_range_select
         self.show_procesado = show_procesado
+        self.data_labels = []
+        self._asignando = False
         
         # Variable para el checkbox
         self.is_selected = tk.BooleanVar()
@@ -268,10 +451,9 @@ class SancionCheckbox:
         self.create_row()
     
     def create_row(self):
-        """Crear la fila con checkbox y datos"""
-        # Frame para la fila completa
-        self.row_frame = tk.Frame(self.parent_frame, bg='white', relief='solid', bd=1, height=35)
-        self.row_frame.grid(row=self.row, column=0, sticky='ew', padx=1, pady=1)
+        """Crear la fila con checkbox y columnas vacías (el contenido lo pone asignar)"""
+        # Frame para la fila completa (lo ubica la tabla dentro del canvas)
+        self.row_frame = tk.Frame(self.parent_frame, bg='white', relief='solid', bd=1, height=ALTO_FILA - 2)
         self.row_frame.grid_propagate(False)
         
         # Configurar grid
@@ -284,24 +466,34 @@ class SancionCheckbox:
         
         for i, width in enumerate(column_widths):
             self.row_frame.grid_columnconfigure(i, minsize=width, weight=0)
+    
+    def asignar(self, sancion, row, seleccionada=False):
+        """♻️ Mostrar otra sanción en esta fila sin recrear widgets"""
+        self.sancion = sancion
+        self.row = row
         
-        # Color alternado
-        bg_color = '#f8f9fa' if self.row % 2 == 0 else 'white'
-        self.row_frame.configure(bg=bg_color)
+        for label, texto in zip(self.data_labels, self._textos_columnas()):
+            label.configure(text=texto)
         
+        self.marcar(seleccionada)
+    
+    def marcar(self, seleccionada):
+        """Reflejar el estado del modelo de selección sin notificar de vuelta"""
+        self._asignando = True
+        self.is_selected.set(seleccionada)
+        self._asignando = False
         self.update_row_color()
     
     def _create_pendiente_row(self):
         """Crear fila para sanción pendiente"""
-        bg_color = '#f8f9fa' if self.row % 2 == 0 else 'white'
         col = 0
         
         # Checkbox
         self.checkbox = tk.Checkbutton(
             self.row_frame,
             variable=self.is_selected,
-            bg=bg_color,
-            activebackground=bg_color,
+            bg='white',
+            activebackground='white',
             font=('Arial', 10),
             cursor='hand2'
         )
@@ -309,155 +501,107 @@ class SancionCheckbox:
         col += 1
         
         # Datos
-        self._create_data_columns(col, bg_color)
+        self._create_data_columns(col)
         
-        # Eventos para seleccionar fila
-        clickeable_widgets = [self.row_frame] + [
-            child for child in self.row_frame.winfo_children() 
-            if isinstance(child, tk.Label)
-        ]
-        for widget in clickeable_widgets:
+        # Eventos para seleccionar fila (Shift+click selecciona un rango)
+        for widget in [self.row_frame] + self.data_labels:
             widget.bind('<Button-1>', self.toggle_selection)
+            widget.bind('<Shift-Button-1>', self.range_selection)
     
     def _create_procesado_row(self):
         """Crear fila para sanción procesada"""
-        bg_color = '#f8f9fa' if self.row % 2 == 0 else 'white'
-        self._create_data_columns(0, bg_color, include_procesado=True)
+        self._create_data_columns(0, include_procesado=True)
     
-    def _create_data_columns(self, start_col, bg_color, include_procesado=False):
-        """Crear columnas de datos"""
+    def _create_data_columns(self, start_col, include_procesado=False):
+        """Crear columnas de datos (ID, Cód, Nombre, Tipo, Fecha, [Proc. Por, Fecha Proc.], Observaciones)"""
+        columnas = [
+            {'font': ('Arial', 8), 'anchor': 'center'},
+            {'font': ('Arial', 9, 'bold'), 'anchor': 'center'},
+            {'font': ('Arial', 9), 'anchor': 'w'},
+            {'font': ('Arial', 8, 'bold'), 'anchor': 'center', 'fg': COLOR_SECUNDARIO},
+            {'font': ('Arial', 8), 'anchor': 'center'},
+        ]
+        if include_procesado:
+            columnas += [
+                {'font': ('Arial', 8, 'bold'), 'anchor': 'center', 'fg': 'green'},
+                {'font': ('Arial', 8), 'anchor': 'center'},
+            ]
+        columnas.append({'font': ('Arial', 8), 'anchor': 'w'})
+        
         col = start_col
+        for opciones in columnas:
+            label = tk.Label(self.row_frame, bg='white', **opciones)
+            label.grid(row=0, column=col, padx=2, pady=3, sticky='ew')
+            self.data_labels.append(label)
+            col += 1
         
-        # ID
-        id_label = tk.Label(
+        # Botón detalles
+        detalles_btn = tk.Button(
             self.row_frame,
-            text=self.sancion.get('id', '')[:8] + '...',
-            bg=bg_color,
+            text="👁️",
+            command=self.show_details,
+            bg=COLOR_PRINCIPAL,
+            fg='white',
             font=('Arial', 8),
-            anchor='center'
-        )
-        id_label.grid(row=0, column=col, padx=2, pady=3, sticky='ew')
-        col += 1
-        
-        # Código empleado
-        cod_label = tk.Label(
-            self.row_frame,
-            text=str(self.sancion.get('empleado_cod', '')),
-            bg=bg_color,
-            font=('Arial', 9, 'bold'),
-            anchor='center'
+            width=2,
+            height=1,
+            relief='flat',
+            cursor='hand2'
         )
-        cod_label.grid(row=0, column=col, padx=2, pady=3, sticky='ew')
-        col += 1
+        detalles_btn.grid(row=0, column=col, padx=2, pady=2)
+    
+    def _textos_columnas(self):
+        """Textos de las columnas de datos para la sanción asignada"""
+        sancion = self.sancion
         
-        # Nombre empleado
-        nombre_text = self.sancion.get('empleado_nombre', '')
+        nombre_text = sancion.get('empleado_nombre', '') or ''
         if len(nombre_text) > 25:
             nombre_text = nombre_text[:22] + '...'
         
-        nombre_label = tk.Label(
-            self.row_frame,
-            text=nombre_text,
-            bg=bg_color,
-            font=('Arial', 9),
-            anchor='w'
-        )
-        nombre_label.grid(row=0, column=col, padx=2, pady=3, sticky='ew')
-        col += 1
-        
-        # Tipo sanción
-        tipo_text = self.sancion.get('tipo_sancion', '')
+        tipo_text = sancion.get('tipo_sancion', '') or ''
         if len(tipo_text) > 15:
             tipo_text = tipo_text[:12] + '...'
         
-        tipo_label = tk.Label(
-            self.row_frame,
-            text=tipo_text,
-            bg=bg_color,
-            font=('Arial', 8, 'bold'),
-            anchor='center',
-            fg=COLOR_SECUNDARIO
-        )
-        tipo_label.grid(row=0, column=col, padx=2, pady=3, sticky='ew')
-        col += 1
-        
-        # Fecha
-        fecha_label = tk.Label(
-            self.row_frame,
-            text=self.sancion.get('fecha', '')[:10],
-            bg=bg_color,
-            font=('Arial', 8),
-            anchor='center'
-        )
-        fecha_label.grid(row=0, column=col, padx=2, pady=3, sticky='ew')
-        col += 1
+        textos = [
+            (sancion.get('id', '') or '')[:8] + '...',
+            str(sancion.get('empleado_cod', '')),
+            nombre_text,
+            tipo_text,
+            (sancion.get('fecha', '') or '')[:10],
+        ]
         
         # Si es procesado, agregar columnas adicionales
-        if include_procesado:
-            # Procesado por
-            procesado_label = tk.Label(
-                self.row_frame,
-                text=self.sancion.get('procesado_por', 'N/A'),
-                bg=bg_color,
-                font=('Arial', 8, 'bold'),
-                anchor='center',
-                fg='green'
-            )
-            procesado_label.grid(row=0, column=col, padx=2, pady=3, sticky='ew')
-            col += 1
-            
-            # Fecha procesamiento
-            fecha_proc_label = tk.Label(
-                self.row_frame,
-                text=self.sancion.get('fecha_procesamiento', '')[:10],
-                bg=bg_color,
-                font=('Arial', 8),
-                anchor='center'
-            )
-            fecha_proc_label.grid(row=0, column=col, padx=2, pady=3, sticky='ew')
-            col += 1
+        if self.show_procesado:
+            textos += [
+                sancion.get('procesado_por', 'N/A'),
+                (sancion.get('fecha_procesamiento', '') or '')[:10],
+            ]
         
         # Observaciones
-        obs_text = self.sancion.get('observaciones', '') or ''
+        obs_text = sancion.get('observaciones', '') or ''
         if len(obs_text) > 20:
             obs_text = obs_text[:17] + '...'
+        textos.append(obs_text)
         
-        obs_label = tk.Label(
-            self.row_frame,
-            text=obs_text,
-            bg=bg_color,
-            font=('Arial', 8),
-            anchor='w'
-        )
-        obs_label.grid(row=0, column=col, padx=2, pady=3, sticky='ew')
-        col += 1
-        
-        # Botón detalles
-        detalles_btn = tk.Button(
-            self.row_frame,
-            text="👁️",
-            command=self.show_details,
-            bg=COLOR_PRINCIPAL,
-            fg='white',
-            font=('Arial', 8),
-            width=2,
-            height=1,
-            relief='flat',
-            cursor='hand2'
-        )
-        detalles_btn.grid(row=0, column=col, padx=2, pady=2)
+        return textos
     
     def on_check_change(self, *args):
         """Callback cuando cambia el estado del checkbox"""
-        if not self.show_procesado:
+        if not self.show_procesado and not self._asignando:
             self.update_row_color()
-            self.on_selection_change()
+            self.on_selection_change(self.row, self.is_selected.get())
     
     def toggle_selection(self, event=None):
         """Alternar selección al hacer click en la fila"""
         if not self.show_procesado:
             self.is_selected.set(not self.is_selected.get())
     
+    def range_selection(self, event=None):
+        """Shift+click: seleccionar desde la última fila marcada hasta esta"""
+        if not self.show_procesado and self.on_range_select:
+            self.on_range_select(self.row)
+        return 'break'
+    
     def update_row_color(self):
         """Actualizar color de la fila según selección"""
         if not self.show_procesado and self.is_selected.get():
@@ -533,23 +677,76 @@ class SancionCheckbox:
 
 class SancionesTab:
     """⚡ OPTIMIZADA: Pestaña de sanciones con mejor rendimiento"""
-    def __init__(self, parent, categoria, sanciones, on_procesar, on_refresh, es_historial=False):
+    def __init__(self, parent, categoria, sanciones, on_procesar, on_refresh, es_historial=False,
+                 total=None, cargar_pagina=None, despachador=None):
         self.categoria = categoria
-        self.sanciones = sanciones
+        self.despachador = despachador
+        self.sanciones = list(sanciones)
         self.on_procesar = on_procesar
         self.on_refresh = on_refresh
         self.es_historial = es_historial
-        self.checkboxes = []
+        
+        # ⚡ Tabla virtualizada: pool de filas reutilizables y selección por id
+        self.filas = []
+        self._rango_visible = None
+        
+        # ☑️ Selección por id: las filas visibles observan el modelo
+        self.seleccion = ModeloSeleccion()
+        self.seleccion.suscribir(self._on_seleccion_cambiada)
+        self._ancla_seleccion = None
+        
+        # 📄 Carga por páginas bajo demanda (historial): cargar_pagina(cursor) -> (filas, siguiente_cursor)
+        self.total = total
+        self.cargar_pagina = cargar_pagina
+        self._cursor_pagina = None
+        self._hay_mas_paginas = cargar_pagina is not None
+        self._cargando_pagina = False
+        self._generacion_paginas = 0
+        self._reemplazar_al_recibir = False
+        
+        # 🔄 Huella del contenido mostrado (id, updated_at) para reconciliar al actualizar
+        self._huella_actual = self._huella(self.sanciones)
+        
+        # 🔍 Búsqueda: filas mostradas (todas o las filtradas) e índice construido al primer uso
+        self.visibles = self.sanciones
+        self._indice = None
+        self.texto_busqueda = None
+        self._busqueda_pendiente = None
         
         # Para optimización de rendering
         self._render_queue = queue.Queue()
         self._is_rendering = False
         
-        self.create_tab(parent)
+        # 💤 Pestaña perezosa: solo un marcador con el conteo hasta que se selecciona
+        self.construida = False
+        self.frame = tk.Frame(parent, bg='white')
+        self.root_frame = self.frame
+        self.placeholder_label = tk.Label(
+            self.frame,
+            text=self._texto_marcador(),
+            bg='white',
+            fg='gray',
+            font=('Arial', 12)
+        )
+        self.placeholder_label.pack(expand=True)
+    
+    def _texto_marcador(self):
+        """Texto del marcador mientras la pestaña no se construye"""
+        return f"{self.categoria}: {self._texto_contador()}\n\nCargando filas..."
+    
+    def construir(self):
+        """💤 Construir el contenido de la pestaña la primera vez que se selecciona (una sola vez)"""
+        if self.construida:
+            return
+        
+        self.construida = True
+        self.placeholder_label.destroy()
+        self.create_tab(self.frame)
     
     def create_tab(self, parent):
         """Crear pestaña optimizada"""
         main_frame = tk.Frame(parent, bg='white')
+        main_frame.pack(fill=tk.BOTH, expand=True)
         
         # Header
         header_color = '#28a745' if self.es_historial else COLOR_PRINCIPAL
@@ -574,31 +771,186 @@ class SancionesTab:
         )
         header_label.pack(pady=(15, 5))
         
-        count_text = f"{len(self.sanciones)} procesadas" if self.es_historial else f"{len(self.sanciones)} pendientes"
-        count_label = tk.Label(
+        self.count_label = tk.Label(
             title_frame,
-            text=count_text,
+            text=self._texto_contador(),
             bg=header_color,
             fg='white',
             font=('Arial', 11)
         )
-        count_label.pack()
+        self.count_label.pack()
         
         # Controles
         controls_frame = tk.Frame(main_frame, bg='white')
         controls_frame.pack(fill=tk.X, pady=(0, 15))
         
         self._create_controls(controls_frame)
+        self._create_search_bar(main_frame)
         self._create_table_header(main_frame, header_color)
         self._create_scrollable_content(main_frame)
         self._create_footer(main_frame)
         
-        # Poblar datos de forma asíncrona para mejor rendimiento
+        # Solo se materializan las filas visibles: el costo no depende del total
         self.root_frame = main_frame
-        self._populate_async()
+        self._actualizar_filas()
+        
+        if self.cargar_pagina and not self.sanciones:
+            self._cargar_siguiente_pagina()
         
         return main_frame
     
+    def _texto_contador(self):
+        """Texto del contador del header"""
+        if self.es_historial:
+            return f"{self.total if self.total is not None else len(self.sanciones)} procesadas"
+        return f"{len(self.sanciones)} pendientes"
+    
+    def _texto_footer(self):
+        """Texto del footer informativo"""
+        if self.visibles is not self.sanciones:
+            return f"🔍 {len(self.visibles)} de {len(self.sanciones)} coinciden con la búsqueda | 👁️ Click para ver detalles"
+        if self.es_historial:
+            cargadas = f" | 📄 {len(self.sanciones)} de {self.total} cargadas" if self._hay_mas_paginas else ""
+            return f"💡 Historial de {self.categoria}{cargadas} | 📥 Usa 'Descargar Excel' para exportar | 👁️ Click para ver detalles"
+        return f"💡 {len(self.sanciones)} sanciones pendientes | ☑️ Click en filas para seleccionar (Shift+click: rango) | ⚡ Procesar seleccionadas"
+    
+    def agregar_sanciones(self, nuevas):
+        """📄 NUEVO: Agregar filas de una página recién descargada sin reconstruir la pestaña"""
+        if not nuevas:
+            return
+        
+        self.sanciones.extend(nuevas)
+        self._huella_actual = self._huella(self.sanciones)
+        self._refrescar_vista(datos_cambiados=True)
+        
+        if not self.construida:
+            self.placeholder_label.config(text=self._texto_marcador())
+            return
+        
+        self.count_label.config(text=self._texto_contador())
+        self.footer_label.config(text=self._texto_footer())
+        self._actualizar_filas()
+    
+    def _cargar_siguiente_pagina(self):
+        """📄 NUEVO: Pedir la siguiente página del historial en segundo plano"""
+        if not self._hay_mas_paginas or self._cargando_pagina:
+            return
+        
+        self._cargando_pagina = True
+        cursor = self._cursor_pagina
+        generacion = self._generacion_paginas
+        
+        def pagina_thread():
+            try:
+                pagina, siguiente = self.cargar_pagina(cursor)
+            except Exception as e:
+                print(f"❌ Error cargando página de {self.categoria}: {e}")
+                pagina, siguiente = [], cursor
+            self.despachador.publicar(self._recibir_pagina, pagina, siguiente, generacion)
+        
+        thread = threading.Thread(target=pagina_thread)
+        thread.daemon = True
+        thread.start()
+    
+    def _recibir_pagina(self, pagina, siguiente, generacion):
+        """📄 Agregar la página recibida (UI thread)"""
+        if generacion != self._generacion_paginas:
+            return  # Página de antes de reiniciar_paginas
+        
+        self._cargando_pagina = False
+        self._cursor_pagina = siguiente
+        self._hay_mas_paginas = siguiente is not None and bool(pagina)
+        
+        if self._reemplazar_al_recibir:
+            self._reemplazar_al_recibir = False
+            self.reconciliar(pagina)
+        else:
+            self.agregar_sanciones(pagina)
+        self.footer_label.config(text=self._texto_footer())
+    
+    def reiniciar_paginas(self, total):
+        """🔄 El total del historial cambió: volver a leer desde la primera página"""
+        self.total = total
+        self._cursor_pagina = None
+        self._hay_mas_paginas = True
+        self._cargando_pagina = False
+        self._generacion_paginas += 1
+        
+        if not self.construida:
+            self.sanciones = []
+            self._huella_actual = self._huella(self.sanciones)
+            self._refrescar_vista(datos_cambiados=True)
+            self.placeholder_label.config(text=self._texto_marcador())
+            return
+        
+        self.count_label.config(text=self._texto_contador())
+        self._reemplazar_al_recibir = True
+        self._cargar_siguiente_pagina()
+    
+    @staticmethod
+    def _huella(sanciones):
+        """Huella del contenido: cambia si se agrega, quita, reordena o modifica una fila"""
+        return hash(tuple((s.get('id'), s.get('updated_at')) for s in sanciones))
+    
+    def reconciliar(self, nuevas):
+        """
+        🔄 NUEVO: Aplicar un resultado nuevo sin reconstruir la pestaña
+        Compara por id y updated_at, conserva selección y scroll. Retorna True si hubo cambios.
+        """
+        nuevas = list(nuevas)
+        huella = self._huella(nuevas)
+        if huella == self._huella_actual:
+            return False
+        
+        anteriores = {s['id']: s.get('updated_at') for s in self.sanciones}
+        actuales = {s['id']: s.get('updated_at') for s in nuevas}
+        quitadas = anteriores.keys() - actuales.keys()
+        agregadas = len(actuales.keys() - anteriores.keys())
+        modificadas = sum(1 for id_sancion, marca in actuales.items()
+                          if id_sancion in anteriores and anteriores[id_sancion] != marca)
+        print(f"🔄 {self.categoria}: +{agregadas} -{len(quitadas)} ~{modificadas}")
+        
+        ancla = self._id_primera_visible()
+        
+        self.sanciones = nuevas
+        self._huella_actual = huella
+        self._ancla_seleccion = None
+        self.seleccion.quitar(quitadas)
+        self._refrescar_vista(datos_cambiados=True)
+        
+        if not self.construida:
+            self.placeholder_label.config(text=self._texto_marcador())
+            return True
+        
+        self.count_label.config(text=self._texto_contador())
+        self.footer_label.config(text=self._texto_footer())
+        self._actualizar_filas()
+        self._restaurar_scroll(ancla)
+        return True
+    
+    def _id_primera_visible(self):
+        """Id de la primera fila en pantalla (para mantener el scroll al reconciliar)"""
+        if not self.construida or not self._rango_visible:
+            return None
+        primera, ultima = self._rango_visible
+        return self.visibles[primera]['id'] if primera < ultima else None
+    
+    def _restaurar_scroll(self, id_ancla):
+        """Volver a mostrar arriba la fila que estaba primera antes de reconciliar"""
+        if id_ancla is None or not self.visibles:
+            return
+        
+        indice = next((i for i, s in enumerate(self.visibles) if s['id'] == id_ancla), None)
+        if indice is not None:
+            self.canvas.yview_moveto(indice / len(self.visibles))
+    
+    def _on_scroll(self, primero, ultimo):
+        """Cargar la siguiente página al acercarse al final del scroll"""
+        self.scrollbar.set(primero, ultimo)
+        self._render_visible()
+        if self._hay_mas_paginas and float(ultimo) > 0.9:
+            self._cargar_siguiente_pagina()
+    
     def _create_controls(self, parent):
         """Crear controles de la pestaña"""
         left_controls = tk.Frame(parent, bg='white')
@@ -635,7 +987,21 @@ class SancionesTab:
                 padx=15,
                 pady=8
             )
-            clear_btn.pack(side=tk.LEFT, padx=(0, 15))
+            clear_btn.pack(side=tk.LEFT, padx=(0, 8))
+            
+            invert_btn = tk.Button(
+                left_controls,
+                text="🔁 Invertir",
+                command=self.invert_selection,
+                bg='#6c757d',
+                fg='white',
+                font=('Arial', 10),
+                relief='flat',
+                cursor='hand2',
+                padx=15,
+                pady=8
+            )
+            invert_btn.pack(side=tk.LEFT, padx=(0, 15))
             
             self.selected_count_label = tk.Label(
                 left_controls,
@@ -692,6 +1058,83 @@ class SancionesTab:
         )
         refresh_btn.pack(side=tk.RIGHT, padx=(10, 0))
     
+    def _create_search_bar(self, parent):
+        """🔍 Barra de búsqueda: código, nombre, puesto o agente + rango de fechas"""
+        search_frame = tk.Frame(parent, bg='white')
+        search_frame.pack(fill=tk.X, pady=(0, 10))
+        
+        self.texto_busqueda = tk.StringVar()
+        self.fecha_desde = tk.StringVar()
+        self.fecha_hasta = tk.StringVar()
+        
+        tk.Label(search_frame, text="🔍 Buscar:", bg='white', font=('Arial', 10, 'bold')).pack(side=tk.LEFT)
+        tk.Entry(search_frame, textvariable=self.texto_busqueda, font=('Arial', 10), width=35).pack(side=tk.LEFT, padx=(5, 15))
+        
+        tk.Label(search_frame, text="📅 Desde:", bg='white', font=('Arial', 10)).pack(side=tk.LEFT)
+        tk.Entry(search_frame, textvariable=self.fecha_desde, font=('Arial', 10), width=11).pack(side=tk.LEFT, padx=(5, 10))
+        tk.Label(search_frame, text="Hasta:", bg='white', font=('Arial', 10)).pack(side=tk.LEFT)
+        tk.Entry(search_frame, textvariable=self.fecha_hasta, font=('Arial', 10), width=11).pack(side=tk.LEFT, padx=(5, 10))
+        
+        clear_search_btn = tk.Button(
+            search_frame,
+            text="✖ Limpiar",
+            command=self.limpiar_busqueda,
+            bg='#6c757d',
+            fg='white',
+            font=('Arial', 9),
+            relief='flat',
+            cursor='hand2',
+            padx=10
+        )
+        clear_search_btn.pack(side=tk.LEFT)
+        
+        for variable in (self.texto_busqueda, self.fecha_desde, self.fecha_hasta):
+            variable.trace('w', self._programar_busqueda)
+    
+    def _programar_busqueda(self, *args):
+        """Aplicar la búsqueda cuando el usuario deja de escribir (debounce)"""
+        if self._busqueda_pendiente is not None:
+            self.root_frame.after_cancel(self._busqueda_pendiente)
+        self._busqueda_pendiente = self.root_frame.after(BUSQUEDA_DEBOUNCE_MS, self._aplicar_busqueda)
+    
+    def _aplicar_busqueda(self):
+        """Filtrar las filas mostradas sin reconstruir la pestaña"""
+        self._busqueda_pendiente = None
+        self._refrescar_vista()
+        self.footer_label.config(text=self._texto_footer())
+        self._ancla_seleccion = None
+        self.canvas.yview_moveto(0)
+        self._actualizar_filas()
+    
+    def limpiar_busqueda(self):
+        """Quitar todos los criterios de búsqueda"""
+        for variable in (self.texto_busqueda, self.fecha_desde, self.fecha_hasta):
+            variable.set('')
+    
+    def _refrescar_vista(self, datos_cambiados=False):
+        """Recalcular las filas mostradas tras cambiar los datos o la búsqueda"""
+        if datos_cambiados:
+            self._indice = None
+        
+        if self.texto_busqueda is None:
+            self.visibles = self.sanciones
+            return
+        
+        texto = self.texto_busqueda.get().strip()
+        desde = self.fecha_desde.get().strip()
+        hasta = self.fecha_hasta.get().strip()
+        if not (texto or desde or hasta):
+            self.visibles = self.sanciones
+            return
+        
+        # Índice construido una vez por carga; se descarta cuando cambian los datos
+        inicio = time.time()
+        if self._indice is None:
+            self._indice = IndiceSanciones(self.sanciones)
+        ids = self._indice.buscar(texto, desde or None, hasta or None)
+        self.visibles = self.sanciones if ids is None else [s for s in self.sanciones if s['id'] in ids]
+        print(f"🔍 {self.categoria}: {len(self.visibles)} coincidencias en {(time.time() - inicio) * 1000:.1f} ms")
+    
     def _create_table_header(self, parent, header_color):
         """Crear header de tabla"""
         header_table_frame = tk.Frame(parent, bg=header_color, height=40)
@@ -720,36 +1163,124 @@ class SancionesTab:
             label.grid(row=0, column=i, padx=1, pady=5, sticky='ew')
     
     def _create_scrollable_content(self, parent):
-        """Crear área scrollable optimizada"""
+        """Crear área scrollable virtualizada (las filas se ubican en el canvas por índice)"""
         canvas_frame = tk.Frame(parent, relief='solid', bd=1, bg='white')
         canvas_frame.pack(fill=tk.BOTH, expand=True, padx=5)
         
         self.canvas = tk.Canvas(canvas_frame, bg='white', highlightthickness=0)
-        scrollbar = ttk.Scrollbar(canvas_frame, orient="vertical", command=self.canvas.yview)
+        self.scrollbar = ttk.Scrollbar(canvas_frame, orient="vertical", command=self.canvas.yview)
         
-        self.scrollable_frame = tk.Frame(self.canvas, bg='white')
-        self.scrollable_frame.grid_columnconfigure(0, weight=1, minsize=800)
-        
-        self.canvas.configure(yscrollcommand=scrollbar.set)
-        self.canvas_window = self.canvas.create_window((0, 0), window=self.scrollable_frame, anchor="nw")
+        self.canvas.configure(yscrollcommand=self._on_scroll, yscrollincrement=ALTO_FILA)
         
         self.canvas.pack(side="left", fill="both", expand=True)
-        scrollbar.pack(side="right", fill="y")
+        self.scrollbar.pack(side="right", fill="y")
+        
+        self.filas = []
+        self._rango_visible = None
+        self._ancho_filas = 800
         
         # Eventos optimizados
         def _on_mousewheel(event):
             self.canvas.yview_scroll(int(-1*(event.delta/120)), "units")
         
         def _on_canvas_configure(event):
-            canvas_width = event.width
-            self.canvas.itemconfig(self.canvas_window, width=canvas_width)
-        
-        def _on_frame_configure(event):
-            self.canvas.configure(scrollregion=self.canvas.bbox("all"))
+            self._ancho_filas = event.width
+            for fila in self.filas:
+                self.canvas.itemconfigure(fila.item, width=event.width - 2)
+            self._actualizar_filas()
         
+        self._on_mousewheel = _on_mousewheel
         self.canvas.bind("<MouseWheel>", _on_mousewheel)
         self.canvas.bind('<Configure>', _on_canvas_configure)
-        self.scrollable_frame.bind('<Configure>', _on_frame_configure)
+    
+    def _crear_filas(self, cantidad):
+        """Agregar filas reutilizables al pool (ocultas hasta que se les asigne una sanción)"""
+        for _ in range(cantidad):
+            fila = SancionCheckbox(
+                self.canvas,
+                self._on_fila_seleccionada,
+                show_procesado=self.es_historial,
+                on_range_select=self._seleccionar_rango
+            )
+            fila.item = self.canvas.create_window(
+                1, 0, window=fila.row_frame, anchor="nw",
+                width=self._ancho_filas - 2, height=ALTO_FILA - 2, state='hidden'
+            )
+            
+            # La rueda del mouse sobre una fila también desplaza la tabla
+            for widget in [fila.row_frame] + fila.row_frame.winfo_children():
+                widget.bind("<MouseWheel>", self._on_mousewheel)
+            
+            self.filas.append(fila)
+    
+    def _actualizar_filas(self):
+        """⚡ Ajustar el área scrollable al total de filas y redibujar las visibles"""
+        self.canvas.configure(scrollregion=(0, 0, self._ancho_filas, len(self.visibles) * ALTO_FILA))
+        self._render_visible(forzar=True)
+        
+        if not self.es_historial:
+            self.update_selected_count()
+    
+    def _render_visible(self, forzar=False):
+        """
+        ⚡ VIRTUALIZADO: Materializar solo las filas del viewport reciclando el pool
+        Cada índice usa la fila (índice % tamaño del pool): las que siguen visibles no se tocan.
+        """
+        if not self.filas and not self.visibles:
+            return
+        
+        necesarias = max(self.canvas.winfo_height(), ALTO_FILA) // ALTO_FILA + 2
+        if len(self.filas) < necesarias:
+            self._crear_filas(necesarias - len(self.filas))
+            forzar = True
+        
+        primera = max(0, int(self.canvas.canvasy(0)) // ALTO_FILA)
+        ultima = min(len(self.visibles), primera + len(self.filas))
+        if not forzar and (primera, ultima) == self._rango_visible:
+            return
+        self._rango_visible = (primera, ultima)
+        
+        usadas = set()
+        for indice in range(primera, ultima):
+            posicion = indice % len(self.filas)
+            fila = self.filas[posicion]
+            usadas.add(posicion)
+            
+            sancion = self.visibles[indice]
+            if forzar or fila.row != indice or fila.sancion is not sancion:
+                fila.asignar(sancion, indice, sancion['id'] in self.seleccion)
+                self.canvas.coords(fila.item, 1, indice * ALTO_FILA + 1)
+            self.canvas.itemconfigure(fila.item, state='normal')
+        
+        for posicion, fila in enumerate(self.filas):
+            if posicion not in usadas:
+                self.canvas.itemconfigure(fila.item, state='hidden')
+    
+    def _on_fila_seleccionada(self, indice, seleccionada):
+        """Registrar en el modelo el click de una fila (sobrevive al reciclado de filas)"""
+        self._ancla_seleccion = indice
+        self.seleccion.seleccionar(self.visibles[indice]['id'], seleccionada)
+    
+    def _seleccionar_rango(self, indice):
+        """Seleccionar todas las filas entre el último click y esta"""
+        if self._ancla_seleccion is None or self._ancla_seleccion >= len(self.visibles):
+            self._ancla_seleccion = indice
+        
+        desde, hasta = sorted((self._ancla_seleccion, indice))
+        self.seleccion.seleccionar_varios(s['id'] for s in self.visibles[desde:hasta + 1])
+    
+    def _on_seleccion_cambiada(self, cambiados):
+        """Observador del modelo: repintar solo las filas visibles afectadas y el contador"""
+        if not self.construida:
+            return
+        
+        primera, ultima = self._rango_visible or (0, 0)
+        for indice in range(primera, ultima):
+            fila = self.filas[indice % len(self.filas)]
+            if fila.sancion['id'] in cambiados:
+                fila.marcar(fila.sancion['id'] in self.seleccion)
+        
+        self.update_selected_count()
     
     def _create_footer(self, parent):
         """Crear footer informativo"""
@@ -757,88 +1288,36 @@ class SancionesTab:
         footer_frame.pack(fill=tk.X, pady=(10, 0))
         footer_frame.pack_propagate(False)
         
-        if self.es_historial:
-            footer_text = f"💡 Historial de {self.categoria} | 📥 Usa 'Descargar Excel' para exportar | 👁️ Click para ver detalles"
-        else:
-            footer_text = f"💡 {len(self.sanciones)} sanciones pendientes | ☑️ Click en filas para seleccionar | ⚡ Procesar seleccionadas"
-        
-        footer_label = tk.Label(
+        self.footer_label = tk.Label(
             footer_frame,
-            text=footer_text,
+            text=self._texto_footer(),
             bg='#f8f9fa',
             fg='#6c757d',
             font=('Arial', 9)
         )
-        footer_label.pack(pady=8)
-    
-    def _populate_async(self):
-        """⚡ NUEVO: Poblar datos de forma asíncrona para mejor rendimiento"""
-        def populate_thread():
-            try:
-                print(f"📊 Poblando {len(self.sanciones)} sanciones en {self.categoria}")
-                
-                # Crear checkboxes en lotes pequeños para mantener UI responsiva
-                batch_size = 20
-                for i in range(0, len(self.sanciones), batch_size):
-                    batch = self.sanciones[i:i + batch_size]
-                    
-                    # Programar creación de este lote en UI thread
-                    self.root_frame.after(0, self._create_checkbox_batch, batch, i)
-                    
-                    # Pequeña pausa para mantener UI responsiva
-                    time.sleep(0.01)
-                
-                # Actualizar UI final
-                self.root_frame.after(0, self._finalize_population)
-                
-            except Exception as e:
-                print(f"❌ Error poblando pestaña: {e}")
-        
-        thread = threading.Thread(target=populate_thread)
-        thread.daemon = True
-        thread.start()
-    
-    def _create_checkbox_batch(self, batch_sanciones, start_index):
-        """Crear un lote de checkboxes"""
-        for j, sancion in enumerate(batch_sanciones):
-            row_index = start_index + j
-            checkbox_row = SancionCheckbox(
-                sancion, 
-                self.scrollable_frame, 
-                row_index, 
-                self.update_selected_count if not self.es_historial else lambda: None,
-                show_procesado=self.es_historial
-            )
-            self.checkboxes.append(checkbox_row)
-    
-    def _finalize_population(self):
-        """Finalizar población de datos"""
-        self.scrollable_frame.update_idletasks()
-        self.canvas.configure(scrollregion=self.canvas.bbox("all"))
-        
-        if not self.es_historial:
-            self.update_selected_count()
-        
-        print(f"✅ {len(self.checkboxes)} filas creadas en {self.categoria}")
+        self.footer_label.pack(pady=8)
     
     def select_all(self):
-        """Seleccionar todas las sanciones"""
+        """Seleccionar todas las sanciones (las que coinciden con la búsqueda, si hay filtro)"""
         if not self.es_historial:
-            for checkbox in self.checkboxes:
-                checkbox.is_selected.set(True)
+            self.seleccion.seleccionar_varios(s['id'] for s in self.visibles)
     
     def clear_all(self):
         """Deseleccionar todas las sanciones"""
         if not self.es_historial:
-            for checkbox in self.checkboxes:
-                checkbox.is_selected.set(False)
+            self.seleccion.limpiar()
+    
+    def invert_selection(self):
+        """Invertir la selección de la pestaña"""
+        if not self.es_historial:
+            self.seleccion.invertir(s['id'] for s in self.visibles)
     
     def update_selected_count(self):
         """Actualizar contador de seleccionadas"""
         if self.es_historial:
             return
             
-        count = sum(1 for cb in self.checkboxes if cb.is_selected.get())
+        count = len(self.seleccion)
         self.selected_count_label.config(text=f"{count} seleccionadas")
         
         if count > 0:
@@ -852,8 +1331,8 @@ class SancionesTab:
             return
             
         sanciones_seleccionadas = [
-            cb.sancion for cb in self.checkboxes 
-            if cb.is_selected.get()
+            s for s in self.sanciones 
+            if s['id'] in self.seleccion
         ]
         
         if not sanciones_seleccionadas:
@@ -876,7 +1355,8 @@ class SancionesTab:
     
     def descargar_excel(self):
         """Descargar Excel de esta categoría"""
-        if not self.sanciones:
+        total = self.total if self.total is not None else len(self.sanciones)
+        if not total:
             messagebox.showwarning("Sin datos", "No hay sanciones para descargar")
             return
         
@@ -895,26 +1375,30 @@ class SancionesTab:
                 # Mostrar progreso
                 progress = ProgressWindow(self.root_frame.winfo_toplevel(), "Generando Excel")
                 
+                seguimiento = progress.crear_seguimiento(self.despachador, total)
+                
                 def export_thread():
                     try:
-                        progress.update_progress("Preparando datos...", f"Exportando {len(self.sanciones)} registros")
-                        archivo_generado = procesador.exportar_a_excel(self.sanciones, filepath)
+                        self.despachador.publicar(progress.update_progress, "Preparando datos...",
+                                                  f"Exportando {total} registros", canal=progress)
+                        # Historial paginado: exportar todas las páginas, no solo las cargadas en pantalla
+                        datos = procesador.iterar_procesadas(self.categoria) if self.cargar_pagina else self.sanciones
+                        archivo_generado = procesador.exportar_a_excel(datos, filepath, seguimiento)
                         
-                        self.root_frame.after(0, progress.close)
+                        self.despachador.publicar(progress.close)
                         
                         if archivo_generado:
-                            self.root_frame.after(0, lambda: messagebox.showinfo(
-                                "Descarga exitosa", 
-                                f"✅ Excel generado exitosamente:\n{filepath}"
-                            ))
+                            def informar():
+                                messagebox.showinfo("Descarga exitosa", f"✅ Excel generado exitosamente:\n{filepath}")
+                                if messagebox.askyesno("Abrir archivo", "¿Desea abrir el archivo Excel?"):
+                                    os.startfile(filepath)
                             
-                            if self.root_frame.after(0, lambda: messagebox.askyesno("Abrir archivo", "¿Desea abrir el archivo Excel?")):
-                                os.startfile(filepath)
+                            self.despachador.publicar(informar)
                         else:
-                            self.root_frame.after(0, lambda: messagebox.showerror("Error", "No se pudo generar el archivo Excel"))
+                            self.despachador.publicar(messagebox.showerror, "Error", "No se pudo generar el archivo Excel")
                     except Exception as e:
-                        self.root_frame.after(0, progress.close)
-                        self.root_frame.after(0, lambda: messagebox.showerror("Error", f"Error exportando: {e}"))
+                        self.despachador.publicar(progress.close)
+                        self.despachador.publicar(messagebox.showerror, "Error", f"Error exportando: {e}")
                 
                 thread = threading.Thread(target=export_thread)
                 thread.daemon = True
@@ -928,14 +1412,23 @@ class MainWindow:
     def __init__(self, usuario):
         self.usuario = usuario
         self.sanciones_categorizadas = {}
-        self.historial_categorizado = {}
+        self.historial_conteos = {}
+        self.historial_firmas = {}  # categoría -> (total, updated_at más reciente)
+        self.tabs_pendientes = {}
+        self.tabs_historial = {}
+        self.firmas_pestañas_historial = {}  # firma con la que se leyó cada pestaña de historial
+        self.tabs = {}  # nombre del frame en el notebook -> SancionesTab
+        self.sin_conexion = False
+        self.outbox_descartadas = 0  # Escrituras del outbox devueltas a pendientes en esta sesión
         self.root = tk.Tk()
         
-        # Queue para comunicación entre threads
+        # Queue para comunicación entre threads (la vacía el despachador en el hilo de Tk)
         self.update_queue = queue.Queue()
+        self.despachador = DespachadorUI(self.root, self.update_queue)
         
         self.setup_main_window()
         self.cargar_datos()
+        self._programar_verificacion()
         self.root.mainloop()
     
     def setup_main_window(self):
@@ -1030,6 +1523,15 @@ class MainWindow:
         
         self.notebook = ttk.Notebook(self.root, style='Custom.TNotebook')
         self.notebook.pack(fill=tk.BOTH, expand=True, padx=15, pady=15)
+        
+        # 💤 Las pestañas se construyen al seleccionarlas por primera vez
+        self.notebook.bind('<<NotebookTabChanged>>', self._on_tab_changed)
+    
+    def _on_tab_changed(self, event=None):
+        """Construir la pestaña seleccionada si todavía es un marcador"""
+        tab_obj = self.tabs.get(self.notebook.select())
+        if tab_obj:
+            tab_obj.construir()
     
     def _create_footer(self):
         """Crear footer de la aplicación"""
@@ -1049,6 +1551,16 @@ class MainWindow:
         )
         footer_left.pack(side=tk.LEFT, pady=10)
         
+        # ⚠️ Base local de respaldo: visible todo el tiempo, no es la compartida
+        if procesador.aviso_db:
+            tk.Label(
+                footer_content,
+                text=f"⚠️ {procesador.aviso_db}",
+                bg='#f8f9fa',
+                fg=COLOR_ERROR,
+                font=('Arial', 9, 'bold')
+            ).pack(side=tk.LEFT, pady=10, padx=20)
+        
         self.footer_right = tk.Label(
             footer_content,
             text=f"🕐 Última actualización: {datetime.now().strftime('%H:%M:%S')}",
@@ -1057,6 +1569,64 @@ class MainWindow:
             font=('Arial', 9)
         )
         self.footer_right.pack(side=tk.RIGHT, pady=10)
+        
+        # 📤 Escrituras guardadas sin conexión pendientes de enviar
+        self.outbox_label = tk.Label(
+            footer_content,
+            text="",
+            bg='#f8f9fa',
+            fg=COLOR_SECUNDARIO,
+            font=('Arial', 9, 'bold')
+        )
+        self.outbox_label.pack(side=tk.RIGHT, pady=10, padx=20)
+    
+    def _mostrar_outbox(self, profundidad, resumen=None):
+        """📤 Profundidad del outbox, ritmo del último reenvío y descartadas (hilo de Tk)"""
+        texto = f"📤 Outbox: {profundidad} por enviar" if profundidad else ""
+        if resumen and resumen.get('enviadas'):
+            texto = (f"📤 Reenviadas {resumen['enviadas']} a {resumen['filas_por_segundo']:.1f} filas/s"
+                     + (f" | {profundidad} por enviar" if profundidad else ""))
+        
+        if resumen and resumen.get('descartadas'):
+            self.outbox_descartadas += resumen['descartadas']
+            messagebox.showwarning(
+                "Envío descartado",
+                f"⚠️ {resumen['descartadas']} sanciones guardadas sin conexión no se pudieron enviar "
+                f"y volvieron a pendientes. Revíselas y procéselas de nuevo.\n\n"
+                + "\n".join(resumen['detalle_descartadas'][:5])
+            )
+        if self.outbox_descartadas:
+            texto += (" | " if texto else "") + f"⚠️ {self.outbox_descartadas} descartadas (volvieron a pendientes)"
+        
+        self.outbox_label.config(text=texto)
+    
+    def _programar_verificacion(self):
+        """Verificar conexión y outbox cada INTERVALO_VERIFICACION segundos"""
+        self.root.after(INTERVALO_VERIFICACION * 1000, self._verificar_conexion)
+    
+    def _verificar_conexion(self):
+        """📤 Al volver la conexión: reenviar el outbox y recargar si se trabajaba sin conexión"""
+        def verificar_thread():
+            try:
+                profundidad = procesador.profundidad_outbox()
+                if (profundidad or self.sin_conexion) and procesador.test_conexion_supabase():
+                    resumen = procesador.reenviar_outbox() if profundidad else None
+                    profundidad = resumen['pendientes'] if resumen else profundidad
+                    self.despachador.publicar(self._mostrar_outbox, profundidad, resumen)
+                    if self.sin_conexion or (resumen and (resumen['enviadas'] or resumen['conflictos']
+                                                          or resumen['descartadas'])):
+                        self.despachador.publicar(self.cargar_datos)
+                else:
+                    self.despachador.publicar(self._mostrar_outbox, profundidad)
+            except Exception as e:
+                print(f"⚠️ Error verificando conexión/outbox: {e}")
+            finally:
+                # Reprogramar al terminar: nunca dos verificaciones a la vez
+                self.despachador.publicar(self._programar_verificacion)
+        
+        thread = threading.Thread(target=verificar_thread)
+        thread.daemon = True
+        thread.start()
     
     def cargar_datos(self):
         """⚡ OPTIMIZADO: Cargar datos de forma asíncrona"""
@@ -1072,76 +1642,230 @@ class MainWindow:
     def _cargar_datos_thread(self):
         """Cargar datos en hilo separado"""
         try:
+            # 📦 Abrir con la copia local aunque Supabase todavía no responda
+            hay_espejo = procesador.espejo_disponible()
+            if hay_espejo:
+                self._publicar_desde_espejo("📦 Copia local - sincronizando...")
+            
             # Test conexión
             if not procesador.test_conexion_supabase():
-                self.root.after(0, lambda: self.status_label.config(text="❌ Sin conexión"))
-                self.root.after(0, lambda: messagebox.showerror("Error", MSG_CONEXION_ERROR))
+                # 📤 Seguir sin conexión: lo procesado va al outbox y se reenvía al reconectar
+                self.sin_conexion = True
+                if not hay_espejo:
+                    self.despachador.publicar(self._mostrar_pendientes, procesador.categorizar_sanciones([]))
+                    self.despachador.publicar(self._mostrar_historial, procesador.firmas_procesadas_por_categoria())
+                texto = "❌ Sin conexión - mostrando copia local" if hay_espejo else "❌ Sin conexión"
+                self.despachador.publicar(lambda: self.status_label.config(text=texto))
+                self.despachador.publicar(self._mostrar_outbox, procesador.profundidad_outbox())
+                self.despachador.publicar(
+                    messagebox.showwarning, "Sin conexión",
+                    f"{MSG_CONEXION_ERROR}\n\nLo que procese se guardará localmente y se enviará "
+                    f"automáticamente al volver la conexión (se verifica cada {INTERVALO_VERIFICACION}s)."
+                )
                 return
             
-            # Obtener sanciones pendientes (sin doble control)
-            sanciones = procesador.obtener_sanciones_pendientes()
-            self.sanciones_categorizadas = procesador.categorizar_sanciones(sanciones)
+            self.sin_conexion = False
+            
+            # 📤 Enviar primero lo guardado sin conexión para que las pendientes salgan al día
+            if procesador.profundidad_outbox():
+                resumen = procesador.reenviar_outbox()
+                self.despachador.publicar(self._mostrar_outbox, resumen['pendientes'], resumen)
             
-            # Obtener historial
-            procesadas = procesador.obtener_procesadas_completas()
-            self.historial_categorizado = procesador.categorizar_procesadas(procesadas)
+            if hay_espejo:
+                # Solo cambios desde la última sincronización
+                cambios = procesador.sincronizar_espejo()
+                if cambios:
+                    self._publicar_desde_espejo()
+                else:
+                    self.despachador.publicar(self._actualizar_estado)
+                return
             
+            # Primera ejecución: pendientes por páginas, la primera se muestra mientras llegan las siguientes
+            primera_pagina = True
+            for pagina in procesador.iterar_sanciones_pendientes():
+                categorizadas = procesador.categorizar_sanciones(pagina)
+                if primera_pagina:
+                    self.despachador.publicar(self._mostrar_pendientes, categorizadas)
+                    primera_pagina = False
+                else:
+                    self.despachador.publicar(self._agregar_pagina_pendientes, categorizadas)
+            
+            if primera_pagina:
+                # Sin pendientes: mostrar pestañas vacías
+                self.despachador.publicar(self._mostrar_pendientes, procesador.categorizar_sanciones([]))
+            
+            # Historial: sincronizar el espejo local completo la primera vez y mostrar solo conteos,
+            # las filas se cargan por páginas al abrir cada pestaña
+            try:
+                procesador.sincronizar_espejo()
+            except Exception as e:
+                # Los pendientes ya están en pantalla: el historial queda vacío hasta la próxima carga
+                print(f"⚠️ Error sincronizando espejo: {e}")
+            historial_firmas = procesador.firmas_procesadas_por_categoria()
+
             # Actualizar UI
-            self.root.after(0, self._actualizar_pestañas)
+            self.despachador.publicar(self._mostrar_historial, historial_firmas)
             
         except Exception as e:
-            self.root.after(0, lambda: self.status_label.config(text="❌ Error cargando"))
-            self.root.after(0, lambda: messagebox.showerror("Error", f"Error cargando datos: {e}"))
+            self.despachador.publicar(lambda: self.status_label.config(text="❌ Error cargando"))
+            self.despachador.publicar(messagebox.showerror, "Error", f"Error cargando datos: {e}")
     
-    def _actualizar_pestañas(self):
-        """Actualizar pestañas con datos cargados"""
-        # Limpiar pestañas existentes
-        for tab in self.notebook.tabs():
-            self.notebook.forget(tab)
+    def _publicar_desde_espejo(self, estado=None):
+        """Leer pendientes e historial del espejo local y mostrarlos (desde hilo de carga)"""
+        sanciones = procesador.obtener_sanciones_pendientes(sincronizar=False)
+        historial_firmas = procesador.firmas_procesadas_por_categoria()
         
-        # Crear pestañas para pendientes
-        for categoria, sanciones in self.sanciones_categorizadas.items():
+        sanciones_categorizadas = procesador.categorizar_sanciones(sanciones)
+        
+        def mostrar():
+            self.sanciones_categorizadas = sanciones_categorizadas
+            self._fijar_historial(historial_firmas)
+            self._actualizar_pestañas()
+            if estado:
+                self.status_label.config(text=estado)
+        
+        self.despachador.publicar(mostrar)
+    
+    def _mostrar_pendientes(self, sanciones_categorizadas):
+        """Mostrar la primera página de pendientes (el historial llega después)"""
+        self.sanciones_categorizadas = sanciones_categorizadas
+        self._actualizar_pestañas()
+        self.status_label.config(text="🔄 Cargando más páginas e historial...")
+    
+    def _agregar_pagina_pendientes(self, categorizadas):
+        """📄 Agregar una página adicional de pendientes a las pestañas ya creadas"""
+        for categoria, nuevas in categorizadas.items():
+            if not nuevas:
+                continue
+            
+            self.sanciones_categorizadas.setdefault(categoria, []).extend(nuevas)
+            if categoria in self.tabs_pendientes:
+                tab_obj, tab_frame = self.tabs_pendientes[categoria]
+                tab_obj.agregar_sanciones(nuevas)
+                self.notebook.tab(tab_frame, text=self._texto_pestaña(categoria, len(tab_obj.sanciones)))
+        
+        self._actualizar_estado()
+    
+    def _mostrar_historial(self, historial_firmas):
+        """Agregar las pestañas de historial al terminar la carga"""
+        self._fijar_historial(historial_firmas)
+        self._crear_pestañas_historial()
+        self._actualizar_estado()
+    
+    def _fijar_historial(self, historial_firmas):
+        """Guardar firmas (total, updated_at más reciente) y conteos del historial por categoría"""
+        self.historial_firmas = historial_firmas
+        self.historial_conteos = {categoria: total for categoria, (total, _) in historial_firmas.items()}
+    
+    def _texto_pestaña(self, categoria, cantidad, es_historial=False):
+        """Texto de la pestaña del notebook"""
+        if es_historial:
+            emoji = {
+                "Faltas y Permisos": "📚",
+                "Horas y Franco": "📖", 
+                "Resto": "📗"
+            }.get(categoria, "📄")
+            return f"{emoji} H-{categoria} ({cantidad})"
+        
+        emoji = {
+            "Faltas y Permisos": "📋",
+            "Horas y Franco": "⏰", 
+            "Resto": "⚠️"
+        }.get(categoria, "📄")
+        return f"{emoji} {categoria} ({cantidad})"
+    
+    def _actualizar_pestañas(self):
+        """
+        Actualizar pestañas con datos cargados
+        🔄 Reconcilia las existentes: solo se tocan las que cambiaron, conservando scroll y selección
+        """
+        self._crear_pestañas_pendientes()
+        self._crear_pestañas_historial()
+        self._actualizar_estado()
+        self._on_tab_changed()
+    
+    def _insertar_pestaña(self, posicion, tab_obj, texto):
+        """Agregar una pestaña en la posición indicada del notebook"""
+        if posicion >= len(self.notebook.tabs()):
+            self.notebook.add(tab_obj.frame, text=texto)
+        else:
+            self.notebook.insert(posicion, tab_obj.frame, text=texto)
+        self.tabs[str(tab_obj.frame)] = tab_obj
+    
+    def _quitar_pestaña(self, tab_frame):
+        """Quitar una pestaña del notebook y liberar sus widgets"""
+        self.notebook.forget(tab_frame)
+        self.tabs.pop(str(tab_frame), None)
+        tab_frame.destroy()
+    
+    def _crear_pestañas_pendientes(self):
+        """Crear pestañas para pendientes (o reconciliar las que ya existen)"""
+        for posicion, (categoria, sanciones) in enumerate(self.sanciones_categorizadas.items()):
+            if categoria in self.tabs_pendientes:
+                tab_obj, tab_frame = self.tabs_pendientes[categoria]
+                if tab_obj.reconciliar(sanciones):
+                    self.notebook.tab(tab_frame, text=self._texto_pestaña(categoria, len(tab_obj.sanciones)))
+                continue
+            
             tab_obj = SancionesTab(
                 self.notebook, 
                 categoria, 
                 sanciones, 
                 self.procesar_sanciones,
                 self.cargar_datos,
-                es_historial=False
+                es_historial=False,
+                despachador=self.despachador
             )
-            tab_frame = tab_obj.create_tab(self.notebook)
-            
-            emoji = {
-                "Faltas y Permisos": "📋",
-                "Horas y Franco": "⏰", 
-                "Resto": "⚠️"
-            }.get(categoria, "📄")
-            
-            self.notebook.add(tab_frame, text=f"{emoji} {categoria} ({len(sanciones)})")
+            self._insertar_pestaña(posicion, tab_obj, self._texto_pestaña(categoria, len(sanciones)))
+            self.tabs_pendientes[categoria] = (tab_obj, tab_obj.frame)
         
-        # Crear pestañas para historial
-        for categoria, sanciones in self.historial_categorizado.items():
-            if sanciones:
+        for categoria in list(self.tabs_pendientes):
+            if categoria not in self.sanciones_categorizadas:
+                self._quitar_pestaña(self.tabs_pendientes.pop(categoria)[1])
+    
+    def _crear_pestañas_historial(self):
+        """Crear pestañas para historial (filas por páginas desde el espejo local); sin cambio de firma no se tocan"""
+        posicion = len(self.tabs_pendientes)
+        
+        for categoria, firma in self.historial_firmas.items():
+            total = firma[0]
+            if categoria in self.tabs_historial:
+                tab_obj, tab_frame = self.tabs_historial[categoria]
+                if not total:
+                    self._quitar_pestaña(tab_frame)
+                    del self.tabs_historial[categoria]
+                    self.firmas_pestañas_historial.pop(categoria, None)
+                    continue
+                
+                # Total y updated_at más reciente: detecta ediciones y reemplazos con el mismo total
+                if firma != self.firmas_pestañas_historial.get(categoria):
+                    self.firmas_pestañas_historial[categoria] = firma
+                    tab_obj.reiniciar_paginas(total)
+                    self.notebook.tab(tab_frame, text=self._texto_pestaña(categoria, total, es_historial=True))
+                posicion += 1
+                continue
+            
+            if total:
                 tab_obj = SancionesTab(
                     self.notebook, 
                     categoria, 
-                    sanciones, 
+                    [], 
                     None,
                     self.cargar_datos,
-                    es_historial=True
+                    es_historial=True,
+                    total=total,
+                    cargar_pagina=lambda cursor, c=categoria: procesador.obtener_pagina_procesadas(c, cursor),
+                    despachador=self.despachador
                 )
-                tab_frame = tab_obj.create_tab(self.notebook)
-                
-                emoji = {
-                    "Faltas y Permisos": "📚",
-                    "Horas y Franco": "📖", 
-                    "Resto": "📗"
-                }.get(categoria, "📄")
-                
-                self.notebook.add(tab_frame, text=f"{emoji} H-{categoria} ({len(sanciones)})")
-        
+                self._insertar_pestaña(posicion, tab_obj, self._texto_pestaña(categoria, total, es_historial=True))
+                self.tabs_historial[categoria] = (tab_obj, tab_obj.frame)
+                self.firmas_pestañas_historial[categoria] = firma
+                posicion += 1
+    
+    def _actualizar_estado(self):
+        """Actualizar contadores del header y footer"""
         total_pendientes = sum(len(s) for s in self.sanciones_categorizadas.values())
-        total_procesadas = sum(len(s) for s in self.historial_categorizado.values())
+        total_procesadas = sum(self.historial_conteos.values())
         
         self.status_label.config(text=f"✅ {total_pendientes} pendientes | {total_procesadas} procesadas")
         self.footer_right.config(text=f"🕐 Actualizado: {datetime.now().strftime('%H:%M:%S')}")
@@ -1153,28 +1877,54 @@ class MainWindow:
         
         # Mostrar ventana de progreso
         progress_window = ProgressWindow(self.root, f"Procesando {categoria}")
+        seguimiento = progress_window.crear_seguimiento(self.despachador, len(sanciones))
         
         def procesar_thread():
             try:
-                # Callback para actualizar progreso
+                # Mensajes de fase (validación); el avance por fila llega por el seguimiento
                 def callback_progreso(mensaje):
-                    progress_window.update_progress(mensaje, f"Procesando {categoria}")
+                    self.despachador.publicar(progress_window.update_progress, mensaje,
+                                              f"Procesando {categoria}", canal=progress_window)
                 
                 exitosas, fallidas, errores = procesador.procesar_multiples_sanciones(
                     sanciones, 
                     self.usuario, 
-                    callback_progreso
+                    callback_progreso,
+                    seguimiento=seguimiento
                 )
+                conflictos = procesador.resumen_ultima_ejecucion.get('conflictos', 0)
+                reintentos = procesador.resumen_ultima_ejecucion.get('reintentos', 0)
+                en_cola = procesador.resumen_ultima_ejecucion.get('en_cola', 0)
                 
                 # Cerrar progreso
-                self.root.after(0, progress_window.close)
+                self.despachador.publicar(progress_window.close)
+                
+                self.despachador.publicar(self._mostrar_outbox, procesador.profundidad_outbox())
                 
                 # Mostrar resultado
-                if exitosas > 0:
+                if exitosas == 0 and en_cola > 0:
+                    mensaje = f"📤 Sin conexión con Supabase\n\n"
+                    mensaje += f"{en_cola} sanciones quedaron guardadas localmente y se enviarán "
+                    mensaje += f"automáticamente al volver la conexión.\n"
+                    if fallidas > en_cola:
+                        mensaje += f"❌ Otras fallidas: {fallidas - en_cola}\n"
+                    
+                    def mostrar_en_cola():
+                        messagebox.showwarning("Procesamiento en cola", mensaje)
+                        self.cargar_datos()
+                    
+                    self.despachador.publicar(mostrar_en_cola)
+                elif exitosas > 0:
                     mensaje = f"⚡ Procesamiento completado exitosamente\n\n"
                     mensaje += f"🎯 Sanciones procesadas: {exitosas}\n"
                     if fallidas > 0:
                         mensaje += f"❌ Sanciones fallidas: {fallidas}\n"
+                    if conflictos > 0:
+                        mensaje += f"🔒 Ya procesadas por otro usuario: {conflictos}\n"
+                    if reintentos > 0:
+                        mensaje += f"🔁 Reintentos por fallos transitorios: {reintentos}\n"
+                    if en_cola > 0:
+                        mensaje += f"📤 Guardadas sin conexión (se enviarán al reconectar): {en_cola}\n"
                     if errores:
                         mensaje += f"\n📝 Errores detectados:\n" + "\n".join(errores[:5])
                     mensaje += f"\n¿Desea descargar un archivo Excel con las sanciones procesadas?"
@@ -1185,18 +1935,20 @@ class MainWindow:
                             self._descargar_procesadas_recientes(sanciones)
                         self.cargar_datos()
                     
-                    self.root.after(0, mostrar_resultado)
+                    self.despachador.publicar(mostrar_resultado)
                 else:
                     mensaje = f"❌ No se pudieron procesar las sanciones\n\n"
                     mensaje += f"Fallidas: {fallidas}\n"
+                    if conflictos > 0:
+                        mensaje += f"🔒 Ya procesadas por otro usuario: {conflictos}\n"
                     if errores:
                         mensaje += f"Errores: {errores[0] if errores else 'Desconocido'}"
                     
-                    self.root.after(0, lambda: messagebox.showerror("Error", mensaje))
+                    self.despachador.publicar(messagebox.showerror, "Error", mensaje)
                     
             except Exception as e:
-                self.root.after(0, progress_window.close)
-                self.root.after(0, lambda: messagebox.showerror("Error", f"Error procesando: {e}"))
+                self.despachador.publicar(progress_window.close)
+                self.despachador.publicar(messagebox.showerror, "Error", f"Error procesando: {e}")
         
         thread = threading.Thread(target=procesar_thread)
         thread.daemon = True
@@ -1238,20 +1990,16 @@ class MainWindow:
             messagebox.showerror("Error", f"Error al descargar Excel: {e}")
     
     def descargar_todo_excel(self):
-        """Descargar Excel con todo el historial"""
+        """Descargar el historial completo (Excel, CSV o JSON Lines) en streaming desde Supabase"""
         try:
-            procesadas = procesador.obtener_procesadas_completas()
-            
-            if not procesadas:
-                messagebox.showwarning("Sin datos", "No hay sanciones procesadas para descargar")
-                return
+            total = sum(procesador.contar_procesadas_por_categoria().values())
             
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             filename = f"Historial_Completo_RRHH_{timestamp}.xlsx"
             
             filepath = filedialog.asksaveasfilename(
                 defaultextension=".xlsx",
-                filetypes=[("Excel files", "*.xlsx")],
+                filetypes=[("Excel files", "*.xlsx"), ("CSV", "*.csv"), ("JSON Lines", "*.jsonl")],
                 initialfile=filename,
                 title="Guardar Historial Completo"
             )
@@ -1259,28 +2007,29 @@ class MainWindow:
             if filepath:
                 # Mostrar progreso
                 progress = ProgressWindow(self.root, "Exportando Historial")
+                seguimiento = progress.crear_seguimiento(self.despachador, total or None)
                 
                 def export_thread():
                     try:
-                        progress.update_progress("Generando Excel completo...", f"Exportando {len(procesadas)} registros")
-                        archivo_generado = procesador.exportar_a_excel(procesadas, filepath)
+                        self.despachador.publicar(progress.update_progress, "Descargando historial...",
+                                                  "Leyendo páginas de Supabase", canal=progress)
+                        # Página a página: Supabase -> historial local -> archivo, memoria constante
+                        archivo_generado = procesador.exportar_historial(filepath, seguimiento=seguimiento)
                         
-                        self.root.after(0, progress.close)
+                        self.despachador.publicar(progress.close)
                         
                         if archivo_generado:
-                            self.root.after(0, lambda: messagebox.showinfo(
-                                "Descarga exitosa", 
-                                f"✅ Historial completo exportado:\n{filepath}\n\n"
-                                f"📊 Total de registros: {len(procesadas)}"
-                            ))
+                            def informar():
+                                messagebox.showinfo("Descarga exitosa", f"✅ Historial completo exportado:\n{filepath}")
+                                if messagebox.askyesno("Abrir archivo", "¿Desea abrir el archivo?"):
+                                    os.startfile(filepath)
                             
-                            if self.root.after(0, lambda: messagebox.askyesno("Abrir archivo", "¿Desea abrir el archivo Excel?")):
-                                os.startfile(filepath)
+                            self.despachador.publicar(informar)
                         else:
-                            self.root.after(0, lambda: messagebox.showerror("Error", "No se pudo generar el archivo Excel"))
+                            self.despachador.publicar(messagebox.showerror, "Error", "No se pudo generar el archivo")
                     except Exception as e:
-                        self.root.after(0, progress.close)
-                        self.root.after(0, lambda: messagebox.showerror("Error", f"Error exportando: {e}"))
+                        self.despachador.publicar(progress.close)
+                        self.despachador.publicar(messagebox.showerror, "Error", f"Error exportando: {e}")
                 
                 thread = threading.Thread(target=export_thread)
                 thread.daemon = True
@@ -1296,13 +2045,13 @@ class MainWindow:
                 stats = procesador.obtener_estadisticas()
                 
                 if not stats:
-                    self.root.after(0, lambda: messagebox.showwarning("Sin datos", "No se pudieron obtener estadísticas"))
+                    self.despachador.publicar(messagebox.showwarning, "Sin datos", "No se pudieron obtener estadísticas")
                     return
                 
-                self.root.after(0, lambda: self._mostrar_reporte(stats))
+                self.despachador.publicar(self._mostrar_reporte, stats)
                 
             except Exception as e:
-                self.root.after(0, lambda: messagebox.showerror("Error", f"Error generando reporte: {e}"))
+                self.despachador.publicar(messagebox.showerror, "Error", f"Error generando reporte: {e}")
         
         thread = threading.Thread(target=generar_thread)
         thread.daemon = True
@@ -1327,7 +2076,7 @@ class MainWindow:
         text_widget.pack(fill=tk.BOTH, expand=True, padx=15, pady=15)
         
         total_pendientes = sum(len(s) for s in self.sanciones_categorizadas.values())
-        total_procesadas = sum(len(s) for s in self.historial_categorizado.values())
+        total_procesadas = sum(self.historial_conteos.values())
         
         contenido = f"""
 📈 REPORTE COMPLETO DEL SISTEMA RRHH OPTIMIZADO
@@ -1355,8 +2104,8 @@ class MainWindow:
             contenido += f"• {categoria}: {len(sanciones)} pendientes\n"
         
         contenido += f"\n📚 HISTORIAL PROCESADO:\n{'─'*25}\n"
-        for categoria, sanciones in self.historial_categorizado.items():
-            contenido += f"• {categoria}: {len(sanciones)} procesadas\n"
+        for categoria, cantidad in self.historial_conteos.items():
+            contenido += f"• {categoria}: {cantidad} procesadas\n"
         
         contenido += f"\n👤 ACTIVIDAD POR USUARIO:\n{'─'*25}\n"
         for usuario, cantidad in stats.get('por_usuario', {}).items():
@@ -1457,11 +2206,11 @@ class MainWindow:
             try:
                 stats = procesador.obtener_estadisticas()
                 if stats:
-                    self.root.after(0, lambda: self._show_stats_window(stats))
+                    self.despachador.publicar(self._show_stats_window, stats)
                 else:
-                    self.root.after(0, lambda: messagebox.showwarning("Advertencia", "No se pudieron obtener estadísticas"))
+                    self.despachador.publicar(messagebox.showwarning, "Advertencia", "No se pudieron obtener estadísticas")
             except Exception as e:
-                self.root.after(0, lambda: messagebox.showerror("Error", f"Error obteniendo estadísticas: {e}"))
+                self.despachador.publicar(messagebox.showerror, "Error", f"Error obteniendo estadísticas: {e}")
         
         thread = threading.Thread(target=stats_thread)
         thread.daemon = True
@@ -1533,12 +2282,12 @@ class MainWindow:
         def crear_thread():
             try:
                 if procesador.crear_sancion_prueba():
-                    self.root.after(0, lambda: messagebox.showinfo("Éxito", "✅ Sanción de prueba creada exitosamente"))
-                    self.root.after(0, self.cargar_datos)
+                    self.despachador.publicar(messagebox.showinfo, "Éxito", "✅ Sanción de prueba creada exitosamente")
+                    self.despachador.publicar(self.cargar_datos)
                 else:
-                    self.root.after(0, lambda: messagebox.showerror("Error", "❌ No se pudo crear la sanción de prueba"))
+                    self.despachador.publicar(messagebox.showerror, "Error", "❌ No se pudo crear la sanción de prueba")
             except Exception as e:
-                self.root.after(0, lambda: messagebox.showerror("Error", f"Error creando sanción de prueba: {e}"))
+                self.despachador.publicar(messagebox.showerror, "Error", f"Error creando sanción de prueba: {e}")
         
         thread = threading.Thread(target=crear_thread)
         thread.daemon = True
@@ -1549,11 +2298,11 @@ class MainWindow:
         def test_thread():
             try:
                 if procesador.test_conexion_supabase():
-                    self.root.after(0, lambda: messagebox.showinfo("Conexión", "✅ Conexión con Supabase exitosa"))
+                    self.despachador.publicar(messagebox.showinfo, "Conexión", "✅ Conexión con Supabase exitosa")
                 else:
-                    self.root.after(0, lambda: messagebox.showerror("Conexión", "❌ Error de conexión con Supabase"))
+                    self.despachador.publicar(messagebox.showerror, "Conexión", "❌ Error de conexión con Supabase")
             except Exception as e:
-                self.root.after(0, lambda: messagebox.showerror("Error", f"Error probando conexión: {e}"))
+                self.despachador.publicar(messagebox.showerror, "Error", f"Error probando conexión: {e}")
         
         thread = threading.Thread(target=test_thread)
         thread.daemon = True
@@ -2,122 +2,928 @@
 import sqlite3
 import requests
 import json
+import csv
+import os
 import threading
 import time
-from datetime import datetime, date
-from typing import List, Dict, Optional, Tuple, Callable
+import random
+import queue
+import atexit
+import re
+import unicodedata
+from bisect import bisect_left, bisect_right
+from collections import deque
+from itertools import chain
+from contextlib import contextmanager
+from datetime import datetime, date, timezone
+from email.utils import parsedate_to_datetime
+from typing import List, Dict, Optional, Tuple, Callable, Iterator, Iterable
 from concurrent.futures import ThreadPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
 from config import *
 
+class PoolSesionesHTTP:
+    """
+    🌐 NUEVO: Pool de sesiones HTTP reutilizables hacia Supabase
+    Cada sesión mantiene sus conexiones keep-alive; un hilo toma una sesión
+    del pool durante la petición y la devuelve al terminar.
+    Los `observadores(metodo, latencia, status)` reciben cada respuesta (status None si falló la red).
+    """
+    def __init__(self, headers: Dict, tamano: int = HTTP_SESIONES,
+                 conexiones_por_sesion: int = HTTP_CONEXIONES_POR_SESION):
+        self.headers = headers
+        self.tamano = tamano
+        self.observadores: List[Callable[[str, float, Optional[int]], None]] = []
+        # LIFO: la sesión usada más recientemente es la que tiene la conexión más "caliente"
+        self._disponibles = queue.LifoQueue()
+        self._sesiones = []
+
+        for _ in range(tamano):
+            sesion = self._crear_sesion(conexiones_por_sesion)
+            self._sesiones.append(sesion)
+            self._disponibles.put(sesion)
+
+    def _crear_sesion(self, conexiones_por_sesion: int) -> requests.Session:
+        """Crear una sesión con adaptador dimensionado y cabeceras de Supabase"""
+        sesion = requests.Session()
+        sesion.headers.update(self.headers)
+        sesion.headers['Connection'] = 'keep-alive'
+
+        adaptador = HTTPAdapter(
+            pool_connections=1,  # Un solo host (Supabase)
+            pool_maxsize=conexiones_por_sesion,
+            max_retries=0
+        )
+        sesion.mount('https://', adaptador)
+        sesion.mount('http://', adaptador)
+        return sesion
+
+    @contextmanager
+    def sesion(self):
+        """Tomar una sesión del pool (bloquea si todas están en uso)"""
+        sesion = self._disponibles.get()
+        try:
+            yield sesion
+        finally:
+            self._disponibles.put(sesion)
+
+    def request(self, metodo: str, url: str, **kwargs) -> requests.Response:
+        """Ejecutar una petición usando una sesión del pool"""
+        inicio = time.time()
+        status = None
+        try:
+            with self.sesion() as sesion:
+                response = sesion.request(metodo, url, **kwargs)
+            status = response.status_code
+            return response
+        finally:
+            self._notificar(metodo, time.time() - inicio, status)
+
+    def _notificar(self, metodo: str, latencia: float, status: Optional[int]):
+        for observador in self.observadores:
+            try:
+                observador(metodo, latencia, status)
+            except Exception as e:
+                print(f"⚠️ Error en observador HTTP: {e}")
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request('GET', url, **kwargs)
+
+    def patch(self, url: str, **kwargs) -> requests.Response:
+        return self.request('PATCH', url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request('POST', url, **kwargs)
+
+    def precalentar(self, simultaneas: int = HTTP_PRECALENTAR_SIMULTANEAS):
+        """
+        ⚡ Abrir en segundo plano una conexión TCP+TLS en cada sesión del pool
+        Solo toma unas pocas sesiones libres a la vez, así las peticiones reales nunca
+        esperan a que termine todo el precalentamiento. Se detiene si Supabase no responde.
+        """
+        def precalentar_thread():
+            inicio = time.time()
+            url = f"{SUPABASE_URL}/rest/v1/sanciones"
+            params = {'select': 'id', 'limit': 1}
+            calientes = set()
+
+            def abrir(sesion):
+                try:
+                    sesion.head(url, params=params, timeout=(TIMEOUT_CONEXION, REQUEST_TIMEOUT))
+                    return True
+                except Exception:
+                    return False
+
+            with ThreadPoolExecutor(max_workers=simultaneas) as executor:
+                while len(calientes) < self.tamano:
+                    frias = self._tomar_sesiones_frias(calientes, simultaneas)
+                    if not frias:
+                        break  # Las que faltan están en uso: ya se calientan con tráfico real
+                    try:
+                        resultados = list(executor.map(abrir, frias))
+                    finally:
+                        for sesion in frias:
+                            self._disponibles.put(sesion)
+                    calientes.update(frias)
+                    if not all(resultados):
+                        break  # Supabase inalcanzable: no seguir ocupando sesiones
+
+            print(f"🌐 Pool HTTP precalentado: {len(calientes)}/{self.tamano} conexiones en {time.time() - inicio:.2f}s")
+
+        thread = threading.Thread(target=precalentar_thread)
+        thread.daemon = True
+        thread.start()
+
+    def _tomar_sesiones_frias(self, calientes: set, cantidad: int) -> List[requests.Session]:
+        """Sacar del pool hasta `cantidad` sesiones libres sin calentar; el resto vuelve de inmediato"""
+        libres = []
+        while True:
+            try:
+                libres.append(self._disponibles.get_nowait())
+            except queue.Empty:
+                break
+
+        frias = [sesion for sesion in libres if sesion not in calientes][:cantidad]
+        # Devolver las calientes al final para que queden arriba de la pila LIFO
+        for sesion in sorted((s for s in libres if s not in frias), key=lambda s: s in calientes):
+            self._disponibles.put(sesion)
+        return frias
+
+    def cerrar(self):
+        """Cerrar todas las sesiones y sus conexiones"""
+        for sesion in self._sesiones:
+            try:
+                sesion.close()
+            except Exception:
+                pass
+
+class GestorConexionesSQLite:
+    """
+    💾 NUEVO: Conexiones SQLite persistentes, una por hilo
+    Evita abrir la base (un viaje SMB cuando la base local está en red) en cada operación.
+    Uso: `with gestor.conexion() as conn:` confirma o revierte igual que sqlite3.connect,
+    pero la conexión queda abierta para el siguiente uso del mismo hilo.
+    """
+    def __init__(self, ruta_db: str):
+        self.ruta_db = ruta_db
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._conexiones = []  # (hilo, conexión) para poder cerrarlas al salir
+        self._cerrado = False
+
+    def _abrir(self) -> sqlite3.Connection:
+        """Abrir una conexión nueva con pragmas ajustados para recurso de red"""
+        # check_same_thread=False solo para poder cerrarla desde el hilo de apagado;
+        # cada conexión la usa únicamente el hilo que la creó
+        conn = sqlite3.connect(
+            self.ruta_db,
+            timeout=SQLITE_BUSY_TIMEOUT_MS / 1000,
+            check_same_thread=False
+        )
+        # journal_mode se deja por defecto (DELETE): WAL requiere memoria compartida
+        # y no es seguro sobre SMB
+        conn.execute(f"PRAGMA busy_timeout = {int(SQLITE_BUSY_TIMEOUT_MS)}")
+        conn.execute(f"PRAGMA synchronous = {SQLITE_SYNCHRONOUS}")
+        conn.execute(f"PRAGMA cache_size = -{int(SQLITE_CACHE_KB)}")
+        conn.execute(f"PRAGMA temp_store = {SQLITE_TEMP_STORE}")
+        return conn
+
+    def conexion(self) -> sqlite3.Connection:
+        """Obtener la conexión del hilo actual (se crea la primera vez)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            return conn
+
+        with self._lock:
+            if self._cerrado:
+                raise sqlite3.ProgrammingError("Gestor de conexiones cerrado")
+            self._liberar_hilos_terminados()
+            conn = self._abrir()
+            self._conexiones.append((threading.current_thread(), conn))
+
+        self._local.conn = conn
+        return conn
+
+    def _liberar_hilos_terminados(self):
+        """Cerrar conexiones de hilos que ya terminaron (p. ej. workers de un lote)"""
+        vivas = []
+        for hilo, conn in self._conexiones:
+            if hilo.is_alive():
+                vivas.append((hilo, conn))
+            else:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+        self._conexiones = vivas
+
+    def cerrar(self):
+        """🔒 Cerrar todas las conexiones abiertas (hook de apagado)"""
+        with self._lock:
+            self._cerrado = True
+            for _, conn in self._conexiones:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+            self._conexiones = []
+
+class CapacidadesDB:
+    """
+    🔎 NUEVO: Capacidades del esquema local, resueltas una sola vez al iniciar
+    Los métodos de uso frecuente consultan estos atributos en lugar de
+    ejecutar PRAGMA table_info / sqlite_master en cada llamada.
+    """
+    def __init__(self, procesadas_extendida: bool = False, log_operaciones: bool = False,
+                 ultimo_acceso: bool = False, espejo: bool = False, outbox: bool = False):
+        self.procesadas_extendida = procesadas_extendida  # fecha_original + tiempo_procesamiento
+        self.log_operaciones = log_operaciones
+        self.ultimo_acceso = ultimo_acceso
+        self.espejo = espejo  # sanciones_espejo + sync_estado
+        self.outbox = outbox  # outbox_procesamiento
+
+    @classmethod
+    def completas(cls) -> 'CapacidadesDB':
+        """Esquema en la última versión: todo disponible"""
+        return cls(procesadas_extendida=True, log_operaciones=True, ultimo_acceso=True, espejo=True,
+                   outbox=True)
+
+    @classmethod
+    def detectar(cls, cursor) -> 'CapacidadesDB':
+        """Detectar capacidades de un esquema parcial (migración fallida)"""
+        cursor.execute("PRAGMA table_info(procesadas)")
+        columnas_procesadas = {row[1] for row in cursor.fetchall()}
+        cursor.execute("PRAGMA table_info(usuarios)")
+        columnas_usuarios = {row[1] for row in cursor.fetchall()}
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
+        tablas = {row[0] for row in cursor.fetchall()}
+
+        return cls(
+            procesadas_extendida={'fecha_original', 'tiempo_procesamiento'} <= columnas_procesadas,
+            log_operaciones='log_operaciones' in tablas,
+            ultimo_acceso='ultimo_acceso' in columnas_usuarios,
+            espejo={'sanciones_espejo', 'sync_estado'} <= tablas,
+            outbox='outbox_procesamiento' in tablas
+        )
+
+class EscritorDiferido:
+    """
+    📝 NUEVO: Escritura diferida (write-behind) de filas en la base local
+    Los hilos de trabajo solo encolan; un hilo de fondo agrupa las filas y las
+    vuelca con `escribir_lote(filas)` en una sola transacción cada `max_filas`
+    filas o cada `intervalo_ms` milisegundos, lo que ocurra primero.
+    """
+    _DETENER = object()
+
+    def __init__(self, escribir_lote: Callable[[List[tuple]], None],
+                 max_filas: int = ESCRITURA_LOTE_FILAS,
+                 intervalo_ms: int = ESCRITURA_INTERVALO_MS):
+        self.escribir_lote = escribir_lote
+        self.max_filas = max_filas
+        self.intervalo = intervalo_ms / 1000
+        self._cola = queue.Queue()
+        self._lock = threading.Lock()
+        self._fallidas = []  # Filas que no se pudieron persistir desde el último flush
+
+        self._hilo = threading.Thread(target=self._bucle, name="EscritorDiferido")
+        self._hilo.daemon = True
+        self._hilo.start()
+
+    def encolar(self, fila: tuple):
+        """Agregar una fila sin bloquear al hilo que la produce"""
+        if not self._hilo.is_alive():
+            # Escritor ya detenido (apagado): escribir directamente
+            self._escribir([fila])
+            return
+        self._cola.put(fila)
+
+    def flush(self, timeout: Optional[float] = None) -> List[tuple]:
+        """
+        Forzar el volcado de todo lo encolado y esperar a que termine
+        Retorna las filas que no se pudieron persistir desde el último flush
+        """
+        if self._hilo.is_alive():
+            listo = threading.Event()
+            self._cola.put(listo)
+            listo.wait(timeout)
+
+        with self._lock:
+            fallidas, self._fallidas = self._fallidas, []
+        return fallidas
+
+    def cerrar(self, timeout: Optional[float] = None) -> List[tuple]:
+        """🔒 Volcar lo pendiente y detener el hilo de escritura (hook de apagado)"""
+        fallidas = self.flush(timeout)
+        if self._hilo.is_alive():
+            self._cola.put(self._DETENER)
+            self._hilo.join(timeout)
+        return fallidas
+
+    def _bucle(self):
+        pendientes = []
+        limite = 0.0
+
+        while True:
+            espera = max(0.0, limite - time.monotonic()) if pendientes else None
+            try:
+                item = self._cola.get(timeout=espera)
+            except queue.Empty:
+                # Venció el intervalo con filas pendientes
+                self._escribir(pendientes)
+                pendientes = []
+                continue
+
+            if item is self._DETENER:
+                self._escribir(pendientes)
+                return
+
+            if isinstance(item, threading.Event):
+                self._escribir(pendientes)
+                pendientes = []
+                item.set()
+                continue
+
+            if not pendientes:
+                limite = time.monotonic() + self.intervalo
+            pendientes.append(item)
+
+            if len(pendientes) >= self.max_filas:
+                self._escribir(pendientes)
+                pendientes = []
+
+    def _escribir(self, filas: List[tuple]):
+        if not filas:
+            return
+        try:
+            self.escribir_lote(filas)
+        except Exception as e:
+            print(f"⚠️ Error en escritura diferida ({len(filas)} filas): {e}")
+            with self._lock:
+                self._fallidas.extend(filas)
+
+class PlazoAgotado(requests.Timeout):
+    """⏱️ El plazo de la ejecución en curso se agotó antes de poder (re)intentar la petición"""
+
+class ContextoEjecucion:
+    """
+    ⏱️ NUEVO: Plazo y contadores (reintentos, escrituras al outbox) compartidos por los hilos de una ejecución
+    Se activa en cada hilo con `PoliticaReintentos.contexto(ejecucion)`.
+    """
+
+    def __init__(self, plazo: Optional[float] = None):
+        self.plazo = plazo
+        self.limite = time.time() + plazo if plazo else None
+        self.reintentos = 0
+        self.en_cola = 0
+        self._lock = threading.Lock()
+
+    def restante(self) -> Optional[float]:
+        """Segundos que quedan del plazo (None = sin plazo)"""
+        return None if self.limite is None else self.limite - time.time()
+
+    def sumar_reintento(self):
+        with self._lock:
+            self.reintentos += 1
+
+    def sumar_en_cola(self, cantidad: int):
+        with self._lock:
+            self.en_cola += cantidad
+
+class PoliticaReintentos:
+    """
+    🔁 NUEVO: Reintentos de peticiones a Supabase con backoff exponencial y jitter
+    Solo se reintentan peticiones idempotentes o escrituras condicionales (el llamador lo indica):
+    errores de red, timeouts y estados de REINTENTO_ESTADOS. Respeta Retry-After y el plazo
+    del ContextoEjecucion activo en el hilo; nunca espera más allá de ese plazo.
+    """
+
+    def __init__(self, max_reintentos: int = MAX_REINTENTOS, espera_base: float = REINTENTO_ESPERA_BASE,
+                 espera_max: float = REINTENTO_ESPERA_MAX, estados: Tuple[int, ...] = REINTENTO_ESTADOS):
+        self.max_reintentos = max_reintentos
+        self.espera_base = espera_base
+        self.espera_max = espera_max
+        self.estados = estados
+        # 🪣 limitador(metodo, plazo) toma un token antes de cada intento; None = no cabe en el plazo
+        self.limitador: Optional[Callable[[str, Optional[float]], Optional[float]]] = None
+        self._local = threading.local()
+
+    @contextmanager
+    def contexto(self, ejecucion: ContextoEjecucion):
+        """Activar el plazo/contador de una ejecución en el hilo actual"""
+        anterior = getattr(self._local, 'ejecucion', None)
+        self._local.ejecucion = ejecucion
+        try:
+            yield ejecucion
+        finally:
+            self._local.ejecucion = anterior
+
+    def ejecucion_actual(self) -> Optional[ContextoEjecucion]:
+        """Ejecución activa en el hilo actual (None fuera de un procesamiento)"""
+        return getattr(self._local, 'ejecucion', None)
+
+    def ejecutar(self, http: 'PoolSesionesHTTP', metodo: str, url: str,
+                 reintentable: bool, **kwargs) -> requests.Response:
+        """Enviar la petición reintentando fallos transitorios; devuelve la última respuesta"""
+        ejecucion = getattr(self._local, 'ejecucion', None)
+        intento = 0
+
+        while True:
+            restante = ejecucion.restante() if ejecucion else None
+            if restante is not None and restante <= 0:
+                raise PlazoAgotado(f"Plazo de {ejecucion.plazo}s agotado")
+
+            # Token antes de fijar el timeout: la espera por tasa también consume el plazo
+            if self.limitador:
+                if self.limitador(metodo, restante) is None:
+                    raise PlazoAgotado(f"Plazo de {ejecucion.plazo}s agotado esperando turno de envío")
+                restante = ejecucion.restante() if ejecucion else None
+
+            # (conexión, lectura), sin pasarse del plazo
+            lectura = REQUEST_TIMEOUT if restante is None else max(0.1, min(REQUEST_TIMEOUT, restante))
+            kwargs['timeout'] = (TIMEOUT_CONEXION, lectura)
+
+            try:
+                response = http.request(metodo, url, **kwargs)
+                error = None
+            except (requests.ConnectionError, requests.Timeout) as e:
+                response, error = None, e
+
+            if error is None and response.status_code not in self.estados:
+                return response
+            if not reintentable or intento >= self.max_reintentos:
+                if error is not None:
+                    raise error
+                return response
+
+            espera = self._espera(intento, response)
+            restante = ejecucion.restante() if ejecucion else None
+            if restante is not None and espera >= restante:
+                if error is not None:
+                    raise error
+                return response
+
+            intento += 1
+            if ejecucion:
+                ejecucion.sumar_reintento()
+            motivo = error.__class__.__name__ if error is not None else response.status_code
+            print(f"🔁 Reintento {intento}/{self.max_reintentos} de {metodo} en {espera:.2f}s ({motivo})")
+            time.sleep(espera)
+
+    def _espera(self, intento: int, response: Optional[requests.Response]) -> float:
+        """
+        Retry-After si el servidor lo indica; si no, full jitter sobre base * 2^intento.
+        Siempre acotado a espera_max: fuera de un procesamiento no hay plazo que lo limite.
+        """
+        if response is not None:
+            retry_after = response.headers.get('Retry-After')
+            if retry_after:
+                try:
+                    return min(self.espera_max, max(0.0, float(retry_after)))
+                except ValueError:
+                    try:
+                        fecha = parsedate_to_datetime(retry_after)
+                        segundos = (fecha - datetime.now(timezone.utc)).total_seconds()
+                        return min(self.espera_max, max(0.0, segundos))
+                    except (TypeError, ValueError):
+                        pass
+        return random.uniform(0, min(self.espera_max, self.espera_base * (2 ** intento)))
+
+class LimitadorTasa:
+    """
+    🪣 NUEVO: Token bucket compartido por todos los hilos del proceso
+    `tasa` tokens por segundo hasta `capacidad`; cada petición consume uno. Si no hay,
+    el hilo reserva el siguiente token y duerme lo justo (orden de llegada).
+    Registra cuánto esperó cada petición para poder dimensionar el presupuesto.
+    """
+
+    def __init__(self, tasa: float, capacidad: float, max_muestras: int = 1000):
+        self.tasa = tasa
+        self.capacidad = max(1.0, capacidad)
+        self._tokens = self.capacidad
+        self._ultimo = time.monotonic()
+        self._lock = threading.Lock()
+        self.peticiones = 0
+        self.esperaron = 0
+        self.espera_total = 0.0
+        self.espera_max = 0.0
+        self._esperas = deque(maxlen=max_muestras)
+
+    def adquirir(self, plazo: Optional[float] = None) -> Optional[float]:
+        """
+        Consumir un token; devuelve los segundos esperados.
+        Si la espera superaría `plazo` (segundos) no reserva nada y devuelve None.
+        """
+        if self.tasa <= 0:
+            return 0.0
+
+        with self._lock:
+            ahora = time.monotonic()
+            self._tokens = min(self.capacidad, self._tokens + (ahora - self._ultimo) * self.tasa)
+            self._ultimo = ahora
+            espera = (1 - self._tokens) / self.tasa if self._tokens < 1 else 0.0
+            if plazo is not None and espera >= plazo:
+                return None
+            self._tokens -= 1
+
+            self.peticiones += 1
+            self._esperas.append(espera)
+            if espera > 0:
+                self.esperaron += 1
+                self.espera_total += espera
+                self.espera_max = max(self.espera_max, espera)
+
+        if espera > 0:
+            time.sleep(espera)
+        return espera
+
+    def metricas(self, desde: Optional[Dict] = None) -> Dict:
+        """
+        Peticiones, cuántas esperaron y espera media/p95/máxima (s).
+        Con `desde` (unas métricas anteriores) solo cuenta lo ocurrido después de esa foto;
+        p95/máxima se calculan sobre las últimas muestras conservadas.
+        """
+        with self._lock:
+            esperas = list(self._esperas)
+            peticiones, esperaron = self.peticiones, self.esperaron
+            espera_total, espera_max = self.espera_total, self.espera_max
+
+        if desde is not None:
+            peticiones -= desde['peticiones']
+            esperaron -= desde['esperaron']
+            espera_total -= desde['espera_total']
+            esperas = esperas[len(esperas) - min(peticiones, len(esperas)):]
+            espera_max = max(esperas, default=0.0)
+        esperas.sort()
+
+        return {
+            'tasa': self.tasa,
+            'peticiones': peticiones,
+            'esperaron': esperaron,
+            'espera_total': espera_total,
+            'espera_media': espera_total / peticiones if peticiones else 0.0,
+            'espera_p95': esperas[min(len(esperas) - 1, int(0.95 * len(esperas)))] if esperas else 0.0,
+            'espera_max': espera_max
+        }
+
+class ControladorConcurrencia:
+    """
+    🎚️ NUEVO: Límite de peticiones simultáneas ajustado por AIMD
+    Cada respuesta sana suma 1/límite (≈ +1 por ronda); un 429, un 5xx, un error de red
+    o un PATCH más lento que la latencia objetivo multiplica el límite por el factor
+    de reducción (como mucho una vez por período de enfriamiento).
+    """
+
+    def __init__(self, inicial: int = CONCURRENCIA_INICIAL, minimo: int = CONCURRENCIA_MIN,
+                 maximo: int = CONCURRENCIA_MAX, latencia_objetivo: float = CONCURRENCIA_LATENCIA_OBJETIVO,
+                 factor_reduccion: float = CONCURRENCIA_FACTOR_REDUCCION,
+                 enfriamiento: float = CONCURRENCIA_ENFRIAMIENTO):
+        self.minimo = minimo
+        self.maximo = maximo
+        self.latencia_objetivo = latencia_objetivo
+        self.factor_reduccion = factor_reduccion
+        self.enfriamiento = enfriamiento
+        self._limite = float(max(minimo, min(inicial, maximo)))
+        self._en_curso = 0
+        self._ultima_reduccion = 0.0
+        self._condicion = threading.Condition()
+
+    @property
+    def limite(self) -> int:
+        """Peticiones simultáneas permitidas ahora mismo"""
+        return int(self._limite)
+
+    @property
+    def en_curso(self) -> int:
+        return self._en_curso
+
+    def adquirir(self):
+        """Bloquear hasta que haya una ranura libre bajo el límite actual"""
+        with self._condicion:
+            while self._en_curso >= int(self._limite):
+                self._condicion.wait()
+            self._en_curso += 1
+
+    def liberar(self):
+        with self._condicion:
+            self._en_curso -= 1
+            self._condicion.notify()
+
+    def observar(self, metodo: str, latencia: float, status: Optional[int]):
+        """Observador del pool HTTP: la latencia solo cuenta en escrituras (los GET paginados son lentos por diseño)"""
+        if status is None:
+            motivo = "error de red"
+        elif status == 429:
+            motivo = "429"
+        elif status >= 500:
+            motivo = str(status)
+        elif metodo != 'GET' and latencia > self.latencia_objetivo:
+            motivo = f"latencia {latencia:.1f}s"
+        else:
+            motivo = None
+
+        with self._condicion:
+            anterior = int(self._limite)
+            if motivo:
+                ahora = time.time()
+                if ahora - self._ultima_reduccion < self.enfriamiento:
+                    return
+                self._ultima_reduccion = ahora
+                self._limite = max(float(self.minimo), self._limite * self.factor_reduccion)
+            else:
+                self._limite = min(float(self.maximo), self._limite + 1.0 / self._limite)
+
+            nuevo = int(self._limite)
+            if nuevo != anterior:
+                self._condicion.notify_all()
+
+        if nuevo != anterior:
+            print(f"🎚️ Concurrencia: {anterior} → {nuevo}" + (f" ({motivo})" if motivo else ""))
+
+class SeguimientoProgreso:
+    """
+    📊 NUEVO: Progreso agregado de una operación larga (procesamiento o exportación)
+    Los hilos registran completadas con su latencia; el resumen calcula filas/s,
+    p50/p95 de latencia por fila y ETA. `al_cambiar(seguimiento)` se llama tras cada registro.
+    """
+
+    def __init__(self, total: Optional[int] = None,
+                 al_cambiar: Optional[Callable[['SeguimientoProgreso'], None]] = None,
+                 max_latencias: int = 1000):
+        self.total = total
+        self.al_cambiar = al_cambiar
+        self.exitosas = 0
+        self.fallidas = 0
+        self.conflictos = 0
+        self.concurrencia: Optional[int] = None  # Límite vigente del ControladorConcurrencia
+        self.inicio = time.time()
+        self._latencias = deque(maxlen=max_latencias)  # ventana de las últimas filas
+        self._lock = threading.Lock()
+
+    @property
+    def completadas(self) -> int:
+        return self.exitosas + self.fallidas
+
+    def registrar(self, exitosas: int = 0, fallidas: int = 0, conflictos: int = 0,
+                  latencias: Iterable[float] = ()):
+        """Sumar filas terminadas (thread-safe)"""
+        with self._lock:
+            self.exitosas += exitosas
+            self.fallidas += fallidas
+            self.conflictos += conflictos
+            self._latencias.extend(latencias)
+
+        if self.al_cambiar:
+            self.al_cambiar(self)
+
+    def resumen(self) -> Dict:
+        """Foto del progreso: conteos, fracción, filas/s, p50/p95 (s) y ETA (s)"""
+        with self._lock:
+            completadas = self.completadas
+            latencias = sorted(self._latencias)
+            exitosas, fallidas, conflictos = self.exitosas, self.fallidas, self.conflictos
+
+        transcurrido = max(time.time() - self.inicio, 1e-6)
+        filas_por_segundo = completadas / transcurrido
+        fraccion = min(completadas / self.total, 1.0) if self.total else None
+        eta = None
+        if self.total and filas_por_segundo > 0:
+            eta = max(self.total - completadas, 0) / filas_por_segundo
+
+        return {
+            'completadas': completadas,
+            'total': self.total,
+            'exitosas': exitosas,
+            'fallidas': fallidas,
+            'conflictos': conflictos,
+            'fraccion': fraccion,
+            'filas_por_segundo': filas_por_segundo,
+            'p50': self._percentil(latencias, 0.50),
+            'p95': self._percentil(latencias, 0.95),
+            'eta': eta,
+            'concurrencia': self.concurrencia,
+            'transcurrido': transcurrido
+        }
+
+    @staticmethod
+    def _percentil(ordenados: List[float], p: float) -> Optional[float]:
+        if not ordenados:
+            return None
+        return ordenados[min(len(ordenados) - 1, int(p * len(ordenados)))]
+
+class IndiceSanciones:
+    """
+    🔍 NUEVO: Índice en memoria sobre las sanciones cargadas
+    Tokens normalizados (sin acentos ni mayúsculas) de código, nombre, puesto y agente
+    ordenados para búsqueda por prefijo, e índice ordenado por fecha para rangos.
+    """
+    CAMPOS_TEXTO = ('empleado_nombre', 'puesto', 'agente')
+
+    def __init__(self, sanciones: Iterable[Dict]):
+        tokens = []
+        fechas = []
+        for sancion in sanciones:
+            id_sancion = sancion.get('id')
+            if not id_sancion:
+                continue
+
+            cod = sancion.get('empleado_cod')
+            if cod not in (None, ''):
+                tokens.append((str(cod).strip(), id_sancion))
+            for campo in self.CAMPOS_TEXTO:
+                for token in self.tokenizar(sancion.get(campo)):
+                    tokens.append((token, id_sancion))
+
+            fecha = sancion.get('fecha')
+            if fecha:
+                fechas.append((str(fecha)[:10], id_sancion))
+
+        tokens.sort()
+        fechas.sort()
+        self._tokens = tokens
+        self._fechas = fechas
+        self._claves_token = [token for token, _ in tokens]
+        self._claves_fecha = [fecha for fecha, _ in fechas]
+
+    @staticmethod
+    def normalizar(texto) -> str:
+        """Minúsculas y sin acentos: 'Núñez' -> 'nunez'"""
+        texto = unicodedata.normalize('NFKD', str(texto))
+        return ''.join(c for c in texto if not unicodedata.combining(c)).lower()
+
+    @classmethod
+    def tokenizar(cls, texto) -> List[str]:
+        if not texto:
+            return []
+        return re.findall(r'\w+', cls.normalizar(texto))
+
+    def por_prefijo(self, prefijo: str) -> set:
+        """Ids con algún token que empieza por el prefijo (ya normalizado)"""
+        inicio = bisect_left(self._claves_token, prefijo)
+        fin = bisect_left(self._claves_token, prefijo + '\uffff', inicio)
+        return {id_sancion for _, id_sancion in self._tokens[inicio:fin]}
+
+    def por_rango_fechas(self, desde: Optional[str] = None, hasta: Optional[str] = None) -> set:
+        """Ids con fecha entre desde y hasta (YYYY-MM-DD, ambos incluidos)"""
+        inicio = bisect_left(self._claves_fecha, desde) if desde else 0
+        fin = bisect_right(self._claves_fecha, hasta) if hasta else len(self._claves_fecha)
+        return {id_sancion for _, id_sancion in self._fechas[inicio:fin]}
+
+    def buscar(self, texto: str = '', desde: Optional[str] = None,
+               hasta: Optional[str] = None) -> Optional[set]:
+        """
+        Ids que cumplen todos los criterios (cada palabra del texto es un prefijo)
+        Retorna None si no hay criterios (sin filtro).
+        """
+        resultado = None
+        for token in self.tokenizar(texto):
+            ids = self.por_prefijo(token)
+            resultado = ids if resultado is None else resultado & ids
+            if not resultado:
+                return set()
+
+        if desde or hasta:
+            ids = self.por_rango_fechas(desde, hasta)
+            resultado = ids if resultado is None else resultado & ids
+
+        return resultado
+
 class ProcesadorRRHH:
     def __init__(self):
+        inicio = time.time()
         self.supabase_headers = {
             'apikey': SUPABASE_KEY,
             'Authorization': f'Bearer {SUPABASE_KEY}',
             'Content-Type': 'application/json',
             'Prefer': 'return=representation'
         }
+        # 💾 Conexiones SQLite persistentes por hilo (ruta resuelta con timeout acotado)
+        self.db_local = resolver_db_local()
+        mostrar_configuracion(self.db_local)
+        self.tiempos_inicio = {'ruta_db': time.time() - inicio}
+        self.db = GestorConexionesSQLite(self.db_local)
+        self.capacidades = CapacidadesDB()
         self.init_db_local()
+        self.tiempos_inicio['migraciones'] = time.time() - inicio - self.tiempos_inicio['ruta_db']
+        # ⚠️ Trabajando sin la base compartida: queda en el log para saber qué se registró dónde
+        self.aviso_db = aviso_db_respaldo()
+        if self.aviso_db:
+            self.log_operacion("sistema", "BASE_LOCAL_RESPALDO", self.db_local, self.aviso_db)
+        # 📝 Historial local de procesadas con escritura diferida
+        self.escritor = EscritorDiferido(self._insertar_procesadas_local)
         self._lock = threading.Lock()
+        self._lock_espejo = threading.Lock()
+        self._lock_outbox = threading.Lock()
+        # 📤 Resultado del último reenvío del outbox (enviadas, conflictos, filas/s...)
+        self.resumen_outbox = {}
+        # 📊 Detalle del último procesamiento masivo (exitosas, fallidas, conflictos...)
+        self.resumen_ultima_ejecucion = {}
+
+        # 🌐 Pool de sesiones HTTP compartido por todos los hilos
+        self.http = PoolSesionesHTTP(self.supabase_headers)
+        # 🎚️ Concurrencia del procesamiento, ajustada con cada respuesta de Supabase
+        self.concurrencia = ControladorConcurrencia()
+        self.http.observadores.append(self.concurrencia.observar)
+        # 🔁 Reintentos con backoff para todas las llamadas a Supabase
+        self.reintentos = PoliticaReintentos()
+        # 🪣 Presupuesto de peticiones por segundo (lecturas y escrituras por separado)
+        self.limite_lecturas = LimitadorTasa(TASA_LECTURAS_POR_SEGUNDO, RAFAGA_LECTURAS)
+        self.limite_escrituras = LimitadorTasa(TASA_ESCRITURAS_POR_SEGUNDO, RAFAGA_ESCRITURAS)
+        self.reintentos.limitador = self._esperar_turno
+        if HTTP_PRECALENTAR:
+            self.http.precalentar()
         
+        self.tiempos_inicio['total'] = time.time() - inicio
+
+    def _supabase(self, metodo: str, url: str, reintentable: Optional[bool] = None,
+                  **kwargs) -> requests.Response:
+        """
+        🔁 Petición a Supabase con la política de reintentos
+        Por defecto solo se reintentan GET/HEAD; los PATCH condicionales lo piden explícitamente.
+        """
+        if reintentable is None:
+            reintentable = metodo in ('GET', 'HEAD')
+        return self.reintentos.ejecutar(self.http, metodo, url, reintentable, **kwargs)
+
+    def _esperar_turno(self, metodo: str, plazo: Optional[float] = None) -> Optional[float]:
+        """🪣 Tomar un token del presupuesto de lecturas o de escrituras según el método"""
+        if metodo in ('GET', 'HEAD'):
+            return self.limite_lecturas.adquirir(plazo)
+        return self.limite_escrituras.adquirir(plazo)
+
+    def metricas_limitador(self, desde: Optional[Dict[str, Dict]] = None) -> Dict[str, Dict]:
+        """
+        🪣 Esperas por falta de token, para dimensionar TASA_*_POR_SEGUNDO
+        Acumuladas desde el inicio, o solo desde la foto `desde` (otra llamada a este método).
+        """
+        desde = desde or {}
+        return {
+            'lecturas': self.limite_lecturas.metricas(desde.get('lecturas')),
+            'escrituras': self.limite_escrituras.metricas(desde.get('escrituras'))
+        }
+
+    def cerrar(self):
+        """Liberar recursos al salir de la aplicación"""
+        for nombre, m in self.metricas_limitador().items():
+            if m['peticiones']:
+                print(f"🪣 {nombre.capitalize()}: {m['esperaron']}/{m['peticiones']} esperaron token, "
+                      f"media {m['espera_media'] * 1000:.0f} ms, máx {m['espera_max'] * 1000:.0f} ms")
+        no_guardadas = self.escritor.cerrar()
+        if no_guardadas:
+            print(f"⚠️ {len(no_guardadas)} sanciones procesadas no se guardaron en el historial local: "
+                  f"{', '.join(fila[0][:8] for fila in no_guardadas)}")
+        self.http.cerrar()
+        self.db.cerrar()
+
     def init_db_local(self):
         """Inicializar base de datos local SQLite OPTIMIZADA CON MIGRACIÓN"""
         try:
-            with sqlite3.connect(DB_LOCAL) as conn:
+            with self.db.conexion() as conn:
                 cursor = conn.cursor()
                 
-                # ⭐ MIGRACIÓN: Verificar y crear/actualizar tablas existentes
+                # ⭐ MIGRACIÓN: Solo aplica las versiones pendientes (PRAGMA user_version)
                 self._migrar_base_datos(cursor)
                 
-                # Insertar usuarios por defecto
-                for user, pwd in USUARIOS_DEFAULT.items():
-                    cursor.execute('''
-                        INSERT OR IGNORE INTO usuarios (usuario, password) 
-                        VALUES (?, ?)
-                    ''', (user, pwd))
-                
                 conn.commit()
-                print("✅ Base de datos local inicializada/migrada con optimizaciones")
                 
         except Exception as e:
             print(f"❌ Error inicializando DB local: {e}")
             raise
     
+    def _migraciones(self) -> List[Callable]:
+        """🔄 Migraciones versionadas: la posición N (desde 1) lleva el esquema a user_version N"""
+        return [
+            self._migracion_1_estructura_base,
+            self._migracion_2_columnas_procesadas,
+            self._migracion_3_usuarios_y_log,
+            self._migracion_4_espejo_sanciones,
+            self._migracion_5_outbox,
+            self._migracion_6_indice_historial,
+        ]
+    
     def _migrar_base_datos(self, cursor):
-        """🔄 NUEVA: Migrar base de datos existente a nueva estructura"""
+        """
+        🔄 Migrar base de datos existente a nueva estructura
+        Usa PRAGMA user_version: en una base al día no ejecuta ningún ALTER ni PRAGMA table_info.
+        """
+        migraciones = self._migraciones()
+        ultima_version = len(migraciones)
+        
         try:
-            # 1. Crear tabla procesadas con estructura original
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS procesadas (
-                    id TEXT PRIMARY KEY,
-                    fecha_proceso DATE DEFAULT CURRENT_TIMESTAMP,
-                    usuario TEXT,
-                    empleado_cod INTEGER,
-                    empleado_nombre TEXT,
-                    tipo_sancion TEXT
-                )
-            ''')
+            cursor.execute('PRAGMA user_version')
+            version = cursor.fetchone()[0]
             
-            # 2. Agregar nuevas columnas si no existen
-            columnas_nuevas = [
-                ('fecha_original', 'DATE'),
-                ('tiempo_procesamiento', 'REAL')
-            ]
+            if version >= ultima_version:
+                # Esquema al día: capacidades conocidas sin consultar el esquema
+                self.capacidades = CapacidadesDB.completas()
+                print(f"✅ Base de datos local al día (versión {version})")
+                return
             
-            for columna, tipo in columnas_nuevas:
-                try:
-                    cursor.execute(f'ALTER TABLE procesadas ADD COLUMN {columna} {tipo}')
-                    print(f"✅ Agregada columna {columna} a tabla procesadas")
-                except sqlite3.OperationalError as e:
-                    if "duplicate column name" in str(e).lower():
-                        pass  # Columna ya existe
-                    else:
-                        print(f"⚠️ Info columna {columna}: {e}")
-            
-            # 3. Crear tabla usuarios con estructura básica
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS usuarios (
-                    usuario TEXT PRIMARY KEY,
-                    password TEXT,
-                    activo INTEGER DEFAULT 1
-                )
-            ''')
-            
-            # 4. Agregar columna ultimo_acceso si no existe
-            try:
-                cursor.execute('ALTER TABLE usuarios ADD COLUMN ultimo_acceso DATETIME')
-                print("✅ Agregada columna ultimo_acceso a tabla usuarios")
-            except sqlite3.OperationalError as e:
-                if "duplicate column name" in str(e).lower():
-                    pass  # Columna ya existe
-                else:
-                    print(f"⚠️ Info columna ultimo_acceso: {e}")
-            
-            # 5. Crear tabla log_operaciones si no existe
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS log_operaciones (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    fecha DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    usuario TEXT,
-                    operacion TEXT,
-                    detalle TEXT,
-                    resultado TEXT
-                )
-            ''')
-            
-            # 6. Crear índices si no existen (ignora errores si ya existen)
-            indices = [
-                'CREATE INDEX IF NOT EXISTS idx_procesadas_fecha ON procesadas(fecha_proceso)',
-                'CREATE INDEX IF NOT EXISTS idx_procesadas_usuario ON procesadas(usuario)',
-                'CREATE INDEX IF NOT EXISTS idx_log_fecha ON log_operaciones(fecha)'
-            ]
-            
-            for indice in indices:
-                try:
-                    cursor.execute(indice)
-                except sqlite3.OperationalError:
-                    pass  # Índice ya existe
+            for numero in range(version + 1, ultima_version + 1):
+                migraciones[numero - 1](cursor)
+                cursor.execute(f'PRAGMA user_version = {numero}')
+                print(f"🔄 Migración {numero}/{ultima_version} aplicada")
             
+            self.capacidades = CapacidadesDB.completas()
             print("🔄 Migración de base de datos completada")
             
         except Exception as e:
@@ -140,20 +946,122 @@ class ProcesadorRRHH:
                     activo INTEGER DEFAULT 1
                 )
             ''')
+            # Esquema parcial: detectar una sola vez qué hay disponible
+            self.capacidades = CapacidadesDB.detectar(cursor)
+    
+    def _columnas_tabla(self, cursor, tabla: str) -> List[str]:
+        """Columnas existentes de una tabla (solo se usa dentro de migraciones)"""
+        cursor.execute(f"PRAGMA table_info({tabla})")
+        return [row[1] for row in cursor.fetchall()]
+    
+    def _migracion_1_estructura_base(self, cursor):
+        """Versión 1: tablas procesadas y usuarios originales + usuarios por defecto"""
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS procesadas (
+                id TEXT PRIMARY KEY,
+                fecha_proceso DATE DEFAULT CURRENT_TIMESTAMP,
+                usuario TEXT,
+                empleado_cod INTEGER,
+                empleado_nombre TEXT,
+                tipo_sancion TEXT
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS usuarios (
+                usuario TEXT PRIMARY KEY,
+                password TEXT,
+                activo INTEGER DEFAULT 1
+            )
+        ''')
+        
+        for user, pwd in USUARIOS_DEFAULT.items():
+            cursor.execute('''
+                INSERT OR IGNORE INTO usuarios (usuario, password) 
+                VALUES (?, ?)
+            ''', (user, pwd))
+    
+    def _migracion_2_columnas_procesadas(self, cursor):
+        """Versión 2: columnas fecha_original y tiempo_procesamiento en procesadas"""
+        # Bases migradas por versiones anteriores (sin user_version) ya pueden tenerlas
+        existentes = self._columnas_tabla(cursor, 'procesadas')
+        for columna, tipo in [('fecha_original', 'DATE'), ('tiempo_procesamiento', 'REAL')]:
+            if columna not in existentes:
+                cursor.execute(f'ALTER TABLE procesadas ADD COLUMN {columna} {tipo}')
+                print(f"✅ Agregada columna {columna} a tabla procesadas")
+    
+    def _migracion_3_usuarios_y_log(self, cursor):
+        """Versión 3: ultimo_acceso en usuarios, tabla log_operaciones e índices"""
+        if 'ultimo_acceso' not in self._columnas_tabla(cursor, 'usuarios'):
+            cursor.execute('ALTER TABLE usuarios ADD COLUMN ultimo_acceso DATETIME')
+            print("✅ Agregada columna ultimo_acceso a tabla usuarios")
+        
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS log_operaciones (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                fecha DATETIME DEFAULT CURRENT_TIMESTAMP,
+                usuario TEXT,
+                operacion TEXT,
+                detalle TEXT,
+                resultado TEXT
+            )
+        ''')
+        
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_procesadas_fecha ON procesadas(fecha_proceso)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_procesadas_usuario ON procesadas(usuario)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_log_fecha ON log_operaciones(fecha)')
+    
+    def _migracion_4_espejo_sanciones(self, cursor):
+        """Versión 4: espejo local de la tabla sanciones de Supabase + estado de sincronización"""
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS sanciones_espejo (
+                id TEXT PRIMARY KEY,
+                fecha TEXT,
+                updated_at TEXT,
+                status TEXT,
+                comentarios_rrhh TEXT,
+                tipo_sancion TEXT,
+                datos TEXT NOT NULL
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS sync_estado (
+                clave TEXT PRIMARY KEY,
+                valor TEXT
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_espejo_fecha ON sanciones_espejo(fecha, id)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_espejo_updated ON sanciones_espejo(updated_at, id)')
+    
+    def _migracion_5_outbox(self, cursor):
+        """Versión 5: outbox de escrituras de comentarios_rrhh pendientes de enviar (sin conexión)"""
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS outbox_procesamiento (
+                id TEXT PRIMARY KEY,
+                comentario TEXT NOT NULL,
+                usuario TEXT,
+                datos TEXT NOT NULL,
+                creado DATETIME DEFAULT CURRENT_TIMESTAMP,
+                intentos INTEGER DEFAULT 0,
+                ultimo_error TEXT
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_outbox_creado ON outbox_procesamiento(creado)')
+    
+    def _migracion_6_indice_historial(self, cursor):
+        """Versión 6: índice para el keyset del historial con updated_at NULL como ''"""
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_espejo_updated_coalesce
+            ON sanciones_espejo(COALESCE(updated_at, ''), id)
+        ''')
     
     def log_operacion(self, usuario: str, operacion: str, detalle: str, resultado: str):
         """Registrar operación en log local COMPATIBLE"""
         try:
-            with sqlite3.connect(DB_LOCAL) as conn:
+            with self.db.conexion() as conn:
                 cursor = conn.cursor()
                 
-                # 🔄 COMPATIBLE: Verificar si la tabla log_operaciones existe
-                cursor.execute('''
-                    SELECT name FROM sqlite_master 
-                    WHERE type='table' AND name='log_operaciones'
-                ''')
-                
-                if cursor.fetchone():
+                # 🔄 COMPATIBLE: Capacidad detectada al iniciar (sin consultar sqlite_master)
+                if self.capacidades.log_operaciones:
                     # Tabla existe, registrar log
                     cursor.execute('''
                         INSERT INTO log_operaciones (usuario, operacion, detalle, resultado)
@@ -172,7 +1080,7 @@ class ProcesadorRRHH:
     def validar_usuario(self, usuario: str, password: str) -> bool:
         """Validar credenciales de usuario CON COMPATIBILIDAD"""
         try:
-            with sqlite3.connect(DB_LOCAL) as conn:
+            with self.db.conexion() as conn:
                 cursor = conn.cursor()
                 cursor.execute('''
                     SELECT COUNT(*) FROM usuarios 
@@ -181,17 +1089,13 @@ class ProcesadorRRHH:
                 
                 valido = cursor.fetchone()[0] > 0
                 
-                if valido:
-                    # 🔄 COMPATIBLE: Intentar actualizar último acceso si la columna existe
-                    try:
-                        cursor.execute('''
-                            UPDATE usuarios SET ultimo_acceso = CURRENT_TIMESTAMP
-                            WHERE usuario = ?
-                        ''', (usuario,))
-                        conn.commit()
-                    except sqlite3.OperationalError:
-                        # Columna ultimo_acceso no existe - continuar sin actualizar
-                        pass
+                if valido and self.capacidades.ultimo_acceso:
+                    # 🔄 COMPATIBLE: Actualizar último acceso solo si la columna existe
+                    cursor.execute('''
+                        UPDATE usuarios SET ultimo_acceso = CURRENT_TIMESTAMP
+                        WHERE usuario = ?
+                    ''', (usuario,))
+                    conn.commit()
                 
                 return valido
                 
@@ -205,11 +1109,10 @@ class ProcesadorRRHH:
             url = f"{SUPABASE_URL}/rest/v1/sanciones"
             params = {'select': 'count', 'limit': 1}
             
-            response = requests.get(
-                url, 
-                headers=self.supabase_headers, 
-                params=params,
-                timeout=REQUEST_TIMEOUT
+            response = self._supabase(
+                'GET',
+                url,
+                params=params
             )
             return response.status_code == 200
             
@@ -217,91 +1120,463 @@ class ProcesadorRRHH:
             print(f"❌ Error conexión Supabase: {e}")
             return False
     
-    def obtener_sanciones_pendientes(self) -> List[Dict]:
+    def _iterar_paginas_keyset(self, filtros: Dict, campo: str, tamano_pagina: int,
+                               descendente: bool = True) -> Iterator[List[Dict]]:
+        """
+        📄 NUEVO: Recorrer una consulta de sanciones por páginas con keyset pagination
+        Ordena por (campo, id) y pide cada página a partir del último par visto,
+        sin OFFSET, por lo que cada página cuesta lo mismo sin importar su posición.
+        `campo` debe ser no nulo. Los errores HTTP/red se propagan al llamador.
+        """
+        url = f"{SUPABASE_URL}/rest/v1/sanciones"
+        direccion = 'desc' if descendente else 'asc'
+        operador = 'lt' if descendente else 'gt'
+        ultimo = None
+        
+        while True:
+            params = dict(filtros)
+            params['order'] = f'{campo}.{direccion},id.{direccion}'
+            params['limit'] = tamano_pagina
+            
+            if ultimo is not None:
+                valor, id_ultimo = ultimo
+                params['or'] = (f'({campo}.{operador}."{valor}",'
+                                f'and({campo}.eq."{valor}",id.{operador}.{id_ultimo}))')
+            
+            response = self._supabase(
+                'GET',
+                url,
+                params=params
+            )
+            
+            if response.status_code != 200:
+                raise RuntimeError(f"Error API Supabase: {response.status_code} - {response.text[:200]}")
+            
+            pagina = response.json()
+            if pagina:
+                yield pagina
+            
+            if len(pagina) < tamano_pagina:
+                return
+            
+            ultimo = (pagina[-1][campo], pagina[-1]['id'])
+    
+    def iterar_sanciones_pendientes(self, tamano_pagina: int = PAGINA_PENDIENTES) -> Iterator[List[Dict]]:
+        """
+        📄 NUEVO: Generador de sanciones pendientes por páginas (keyset sobre fecha, id)
+        Permite mostrar la primera página mientras se descargan las siguientes.
+        """
+        print("🔍 Consultando sanciones pendientes en Supabase por páginas...")
+        
+        filtros = {k: v for k, v in QUERY_PENDIENTES.items() if k != 'order'}
+        total = 0
+        
+        en_outbox = self._ids_outbox()
+        for numero, pagina in enumerate(self._iterar_paginas_keyset(filtros, 'fecha', tamano_pagina), 1):
+            if en_outbox:
+                pagina = [s for s in pagina if s['id'] not in en_outbox]
+            total += len(pagina)
+            print(f"📄 Página {numero}: {len(pagina)} sanciones (acumulado {total})")
+            yield pagina
+        
+        print(f"📊 Sanciones pendientes encontradas: {total}")
+    
+    def obtener_sanciones_pendientes(self, sincronizar: bool = True) -> List[Dict]:
+        """
+        ⚡ OPTIMIZADO: Sanciones aprobadas sin comentario RRHH desde el espejo local
+        Con sincronizar=True primero trae solo los cambios (delta) desde Supabase.
+        Si el espejo nunca se pudo sincronizar, consulta Supabase por páginas.
+        """
+        if sincronizar:
+            try:
+                self.sincronizar_espejo()
+            except Exception as e:
+                print(f"⚠️ No se pudo sincronizar el espejo local: {e}")
+        
+        if self.espejo_disponible():
+            sanciones = self.leer_espejo_pendientes()
+            print(f"📊 Sanciones pendientes (espejo local): {len(sanciones)}")
+            return sanciones
+        
+        return self._descargar_sanciones_pendientes()
+    
+    def _descargar_sanciones_pendientes(self) -> List[Dict]:
+        """Obtener todas las páginas de pendientes directamente de Supabase"""
+        sanciones = []
+        try:
+            for pagina in self.iterar_sanciones_pendientes():
+                sanciones.extend(pagina)
+            
+            if len(sanciones) == 0:
+                print("ℹ️ No hay sanciones pendientes en este momento")
+            
+            return sanciones
+            
+        except requests.Timeout:
+            print(f"⏱️ Timeout consultando Supabase ({REQUEST_TIMEOUT}s) - {len(sanciones)} sanciones obtenidas")
+            return sanciones
+        except Exception as e:
+            print(f"❌ Error obteniendo sanciones: {e} - {len(sanciones)} sanciones obtenidas")
+            return sanciones
+    
+    def espejo_disponible(self) -> bool:
+        """📦 El espejo local tiene al menos una sincronización completa"""
+        return self._leer_estado_sync('marca_updated_at') is not None
+    
+    def _leer_estado_sync(self, clave: str) -> Optional[str]:
+        if not self.capacidades.espejo:
+            return None
+        try:
+            with self.db.conexion() as conn:
+                fila = conn.execute('SELECT valor FROM sync_estado WHERE clave = ?', (clave,)).fetchone()
+                return fila[0] if fila else None
+        except Exception as e:
+            print(f"⚠️ Error leyendo estado de sincronización: {e}")
+            return None
+    
+    def _guardar_en_espejo(self, conn, filas: List[Dict]):
+        """Insertar/actualizar filas de Supabase en el espejo (sin commit)"""
+        conn.executemany('''
+            INSERT OR REPLACE INTO sanciones_espejo (
+                id, fecha, updated_at, status, comentarios_rrhh, tipo_sancion, datos
+            ) VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', [(
+            fila['id'],
+            fila.get('fecha'),
+            fila.get('updated_at'),
+            fila.get('status'),
+            fila.get('comentarios_rrhh'),
+            fila.get('tipo_sancion'),
+            json.dumps(fila, ensure_ascii=False)
+        ) for fila in filas])
+    
+    def sincronizar_espejo(self) -> int:
+        """
+        📦 NUEVO: Sincronización incremental del espejo local de sanciones
+        1. Delta: filas con updated_at >= última marca (por páginas keyset)
+           Las filas con updated_at NULL no entran en el keyset: se recorren aparte por id.
+        2. Reconciliación barata: compara conteos y solo si difieren corrige
+           borrados y cambios de estado.
+        Retorna la cantidad de filas que cambiaron en el espejo.
+        """
+        if not self.capacidades.espejo:
+            return 0
+        
+        with self._lock_espejo:
+            inicio = time.time()
+            marca = self._leer_estado_sync('marca_updated_at')
+            
+            # gte (no gt): filas con la misma marca confirmadas después se vuelven a traer;
+            # el INSERT OR REPLACE las hace idempotentes
+            # El keyset necesita updated_at no nulo (gte ya excluye los NULL)
+            filtros = {'select': '*', 'updated_at': f'gte.{marca}' if marca else 'not.is.null'}
+            
+            cambios = 0
+            for pagina in self._iterar_paginas_keyset(filtros, 'updated_at', PAGINA_SINCRONIZACION,
+                                                      descendente=False):
+                # Solo contar como cambio lo que no coincide con el espejo
+                cambios += self._contar_cambios_espejo(pagina)
+                with self.db.conexion() as conn:
+                    self._guardar_en_espejo(conn, pagina)
+                    # Avanzar la marca por página: una sincronización interrumpida se retoma
+                    if pagina[-1].get('updated_at'):
+                        conn.execute('INSERT OR REPLACE INTO sync_estado (clave, valor) VALUES (?, ?)',
+                                     ('marca_updated_at', pagina[-1]['updated_at']))
+            
+            # Filas sin updated_at: el delta no las ve, se traen siempre por id y se comparan por contenido
+            for pagina in self._iterar_paginas_keyset({'select': '*', 'updated_at': 'is.null'}, 'id',
+                                                      PAGINA_SINCRONIZACION, descendente=False):
+                cambios += self._contar_cambios_espejo(pagina, por_contenido=True)
+                with self.db.conexion() as conn:
+                    self._guardar_en_espejo(conn, pagina)
+            
+            if marca is None and not self.espejo_disponible():
+                # Tabla remota vacía: marcar el espejo como inicializado igualmente
+                with self.db.conexion() as conn:
+                    conn.execute('INSERT OR REPLACE INTO sync_estado (clave, valor) VALUES (?, ?)',
+                                 ('marca_updated_at', '1970-01-01T00:00:00'))
+            
+            cambios += self._reconciliar_espejo()
+            
+            print(f"📦 Espejo sincronizado en {time.time() - inicio:.2f}s - {cambios} cambios")
+            return cambios
+    
+    def _contar_cambios_espejo(self, pagina: List[Dict], por_contenido: bool = False) -> int:
+        """
+        Filas de la página que son nuevas o tienen otro updated_at en el espejo
+        (con por_contenido, otra fila completa: para las que no tienen updated_at)
+        """
+        ids = [fila['id'] for fila in pagina]
+        columna = 'datos' if por_contenido else 'updated_at'
+        with self.db.conexion() as conn:
+            locales = dict(conn.execute(
+                f"SELECT id, {columna} FROM sanciones_espejo WHERE id IN ({','.join('?' * len(ids))})",
+                ids
+            ).fetchall())
+        if por_contenido:
+            return sum(1 for fila in pagina
+                       if locales.get(fila['id']) != json.dumps(fila, ensure_ascii=False))
+        return sum(1 for fila in pagina if locales.get(fila['id']) != fila.get('updated_at'))
+    
+    def _contar_remoto(self, filtros: Dict) -> Optional[int]:
+        """Conteo exacto en Supabase sin descargar filas (Content-Range)"""
+        params = dict(filtros)
+        params['select'] = 'id'
+        params['limit'] = 1
+        response = self._supabase(
+            'GET',
+            f"{SUPABASE_URL}/rest/v1/sanciones",
+            params=params,
+            headers={'Prefer': 'count=exact'}
+        )
+        if response.status_code not in [200, 206]:
+            return None
+        rango = response.headers.get('Content-Range', '')
+        total = rango.rsplit('/', 1)[-1]
+        return int(total) if total.isdigit() else None
+    
+    def _ids_remotos(self, filtros: Dict) -> set:
+        """Todos los ids que cumplen el filtro (solo la columna id, por páginas)"""
+        filtros = dict(filtros)
+        filtros['select'] = 'id'
+        ids = set()
+        for pagina in self._iterar_paginas_keyset(filtros, 'id', PAGINA_SINCRONIZACION, descendente=False):
+            ids.update(fila['id'] for fila in pagina)
+        return ids
+    
+    def _reconciliar_espejo(self) -> int:
+        """
+        🔎 Detectar borrados y cambios de estado que el delta por updated_at no ve
+        Primero compara conteos (2 consultas de una fila); solo si difieren descarga ids.
+        """
+        cambios = 0
+        filtro_pendientes = {k: v for k, v in QUERY_PENDIENTES.items() if k not in ('select', 'order')}
+        
+        with self.db.conexion() as conn:
+            total_local = conn.execute('SELECT COUNT(*) FROM sanciones_espejo').fetchone()[0]
+            pendientes_local = conn.execute('''
+                SELECT COUNT(*) FROM sanciones_espejo
+                WHERE status = 'aprobado' AND comentarios_rrhh IS NULL
+            ''').fetchone()[0]
+        
+        # 1. Borrados en Supabase y filas que faltan en el espejo
+        total_remoto = self._contar_remoto({})
+        if total_remoto is not None and total_remoto != total_local:
+            ids_remotos = self._ids_remotos({})
+            with self.db.conexion() as conn:
+                ids_locales = {row[0] for row in conn.execute('SELECT id FROM sanciones_espejo')}
+                borrados = list(ids_locales - ids_remotos)
+                for i in range(0, len(borrados), 500):
+                    lote = borrados[i:i + 500]
+                    conn.execute(f"DELETE FROM sanciones_espejo WHERE id IN ({','.join('?' * len(lote))})", lote)
+            cambios += len(borrados)
+            if borrados:
+                print(f"🗑️ Espejo: {len(borrados)} sanciones eliminadas en Supabase")
+            
+            faltantes = list(ids_remotos - ids_locales)
+            self._traer_al_espejo(faltantes)
+            cambios += len(faltantes)
+            if faltantes:
+                print(f"📥 Espejo: {len(faltantes)} sanciones que faltaban")
+        
+        # 2. Cambios de estado sin updated_at nuevo
+        pendientes_remoto = self._contar_remoto(filtro_pendientes)
+        if pendientes_remoto is not None and pendientes_remoto != pendientes_local:
+            ids_remotos = self._ids_remotos(filtro_pendientes)
+            with self.db.conexion() as conn:
+                ids_locales = {row[0] for row in conn.execute('''
+                    SELECT id FROM sanciones_espejo
+                    WHERE status = 'aprobado' AND comentarios_rrhh IS NULL
+                ''')}
+            distintos = list(ids_remotos ^ ids_locales)
+            
+            # Volver a traer esas filas completas y reemplazarlas
+            self._traer_al_espejo(distintos)
+            cambios += len(distintos)
+            if distintos:
+                print(f"🔄 Espejo: {len(distintos)} sanciones con estado corregido")
+        
+        return cambios
+    
+    def _traer_al_espejo(self, ids: List[str]):
+        """Descargar filas completas por id (lotes de 100) y guardarlas en el espejo"""
+        for i in range(0, len(ids), 100):
+            lote = ids[i:i + 100]
+            response = self._supabase(
+                'GET',
+                f"{SUPABASE_URL}/rest/v1/sanciones",
+                params={'select': '*', 'id': f'in.({",".join(lote)})'}
+            )
+            if response.status_code != 200:
+                continue
+            filas = response.json()
+            with self.db.conexion() as conn:
+                self._guardar_en_espejo(conn, filas)
+    
+    def leer_espejo_pendientes(self) -> List[Dict]:
+        """Pendientes desde el espejo local, mismo orden que QUERY_PENDIENTES"""
+        with self.db.conexion() as conn:
+            # 📤 Las que esperan en el outbox ya están procesadas para este operador
+            sin_outbox = (" AND id NOT IN (SELECT id FROM outbox_procesamiento)"
+                          if self.capacidades.outbox else "")
+            filas = conn.execute(f'''
+                SELECT datos FROM sanciones_espejo
+                WHERE status = 'aprobado' AND comentarios_rrhh IS NULL{sin_outbox}
+                ORDER BY fecha DESC, id DESC
+            ''').fetchall()
+        return [json.loads(fila[0]) for fila in filas]
+    
+    def _filtro_categoria_sql(self, categoria: Optional[str]) -> Tuple[str, List[str]]:
+        """Condición SQL equivalente a categorizar_sanciones para una categoría"""
+        if categoria is None:
+            return '', []
+        
+        if categoria == "Resto":
+            # Resto = todo lo que no entra en otra categoría (mismo criterio que categorizar_sanciones)
+            otros = [tipo for cat, tipos in CATEGORIAS.items() if cat != "Resto" for tipo in tipos]
+            marcas = ','.join('?' * len(otros))
+            return f" AND (tipo_sancion IS NULL OR UPPER(tipo_sancion) NOT IN ({marcas}))", otros
+        
+        tipos = CATEGORIAS.get(categoria, [])
+        marcas = ','.join('?' * len(tipos))
+        return f" AND UPPER(tipo_sancion) IN ({marcas})", list(tipos)
+    
+    def contar_procesadas_por_categoria(self) -> Dict[str, int]:
+        """📚 Total de procesadas por categoría sin cargar filas (espejo local)"""
+        return {categoria: total for categoria, (total, _) in self.firmas_procesadas_por_categoria().items()}
+    
+    def firmas_procesadas_por_categoria(self) -> Dict[str, Tuple[int, str]]:
         """
-        ⚡ OPTIMIZADO: Solo consulta Supabase (eliminado doble control)
-        Obtener sanciones aprobadas sin comentario RRHH
+        📚 (total, updated_at más reciente) de las procesadas por categoría (espejo local)
+        Cambia si una fila entra, sale o se edita aunque el total quede igual.
         """
+        firmas = {categoria: (0, '') for categoria in CATEGORIAS.keys()}
+        if not self.espejo_disponible():
+            return firmas
+        
         try:
-            print("🔍 Consultando sanciones pendientes en Supabase...")
-            
-            url = f"{SUPABASE_URL}/rest/v1/sanciones"
-            
-            # ⭐ OPTIMIZACIÓN: Query directa sin doble verificación
-            response = requests.get(
-                url, 
-                headers=self.supabase_headers, 
-                params=QUERY_PENDIENTES,
-                timeout=REQUEST_TIMEOUT
-            )
-            
-            print(f"📡 Status respuesta: {response.status_code}")
-            
-            if response.status_code != 200:
-                print(f"❌ Error API Supabase: {response.status_code}")
-                print(f"❌ Respuesta: {response.text}")
-                return []
-            
-            sanciones = response.json()
-            print(f"📊 Sanciones pendientes encontradas: {len(sanciones)}")
-            
-            if len(sanciones) == 0:
-                print("ℹ️ No hay sanciones pendientes en este momento")
-            
-            return sanciones
+            with self.db.conexion() as conn:
+                filas = conn.execute('''
+                    SELECT tipo_sancion, COUNT(*), MAX(COALESCE(updated_at, '')) FROM sanciones_espejo
+                    WHERE comentarios_rrhh IS NOT NULL
+                    GROUP BY tipo_sancion
+                ''').fetchall()
             
-        except requests.Timeout:
-            print(f"⏱️ Timeout consultando Supabase ({REQUEST_TIMEOUT}s)")
-            return []
+            for tipo, cantidad, ultima in filas:
+                categoria = self.categoria_de_tipo(tipo)
+                total, maxima = firmas[categoria]
+                firmas[categoria] = (total + cantidad, max(maxima, ultima))
         except Exception as e:
-            print(f"❌ Error obteniendo sanciones: {e}")
-            return []
+            print(f"⚠️ Error contando historial: {e}")
+        
+        return firmas
+    
+    def obtener_pagina_procesadas(self, categoria: Optional[str] = None, despues_de: Optional[Tuple[str, str]] = None,
+                                  tamano_pagina: int = PAGINA_HISTORIAL) -> Tuple[List[Dict], Optional[Tuple[str, str]]]:
+        """
+        📚 NUEVO: Una página del historial (más recientes primero), keyset sobre (updated_at, id)
+        updated_at NULL se trata como '' (van al final): una comparación con NULL cortaría la paginación.
+        Retorna (sanciones enriquecidas, cursor de la siguiente página o None si no hay más).
+        """
+        condicion, parametros = self._filtro_categoria_sql(categoria)
+        if despues_de is not None:
+            condicion += (" AND (COALESCE(updated_at, '') < ? OR "
+                          "(COALESCE(updated_at, '') = ? AND id < ?))")
+            parametros += [despues_de[0], despues_de[0], despues_de[1]]
+        
+        with self.db.conexion() as conn:
+            filas = conn.execute(f'''
+                SELECT datos, COALESCE(updated_at, ''), id FROM sanciones_espejo
+                WHERE comentarios_rrhh IS NOT NULL{condicion}
+                ORDER BY COALESCE(updated_at, '') DESC, id DESC
+                LIMIT ?
+            ''', parametros + [tamano_pagina]).fetchall()
+        
+        pagina = [json.loads(fila[0]) for fila in filas]
+        self._enriquecer_con_datos_locales(pagina)
+        
+        siguiente = (filas[-1][1], filas[-1][2]) if len(filas) == tamano_pagina else None
+        return pagina, siguiente
+    
+    def iterar_procesadas(self, categoria: Optional[str] = None,
+                          tamano_pagina: int = PAGINA_HISTORIAL,
+                          remoto: bool = False) -> Iterator[List[Dict]]:
+        """
+        📚 NUEVO: Recorrer TODO el historial por páginas con memoria acotada
+        Lee del espejo local; si aún no existe (o con remoto=True), pagina directamente en Supabase.
+        Cada página se enriquece con el historial local antes de entregarla.
+        """
+        if not remoto and self.espejo_disponible():
+            cursor = None
+            while True:
+                pagina, cursor = self.obtener_pagina_procesadas(categoria, cursor, tamano_pagina)
+                if pagina:
+                    yield pagina
+                if cursor is None:
+                    return
+        
+        # El keyset necesita updated_at no nulo: las filas sin updated_at se recorren aparte por id
+        filtros = {'select': '*', 'comentarios_rrhh': 'not.is.null', 'updated_at': 'not.is.null'}
+        filtros_nulos = {'select': '*', 'comentarios_rrhh': 'not.is.null', 'updated_at': 'is.null'}
+        paginas = chain(self._iterar_paginas_keyset(filtros, 'updated_at', tamano_pagina),
+                        self._iterar_paginas_keyset(filtros_nulos, 'id', tamano_pagina))
+        for pagina in paginas:
+            if categoria is not None:
+                pagina = [s for s in pagina if self.categoria_de_tipo(s.get('tipo_sancion')) == categoria]
+            self._enriquecer_con_datos_locales(pagina)
+            if pagina:
+                yield pagina
     
-    def validar_disponibilidad_sanciones(self, ids_sanciones: List[str]) -> Tuple[List[str], List[str]]:
+    def validar_disponibilidad_sanciones(self, ids_sanciones: List[str],
+                                         ejecucion: Optional[ContextoEjecucion] = None) -> Tuple[List[str], List[str]]:
         """
         🔒 NUEVO: Validar que las sanciones siguen disponibles (control de concurrencia)
+        ⚡ Consulta en lotes de VALIDACION_LOTE_IDS en paralelo e indexa el resultado por id
+        ⏱️ Los hilos de validación respetan el plazo/contador de `ejecucion` (por defecto, la del hilo actual)
         Retorna: (disponibles, no_disponibles)
         """
         try:
             if not ids_sanciones:
                 return [], []
             
-            print(f"🔍 Validando disponibilidad de {len(ids_sanciones)} sanciones...")
+            if ejecucion is None:
+                ejecucion = self.reintentos.ejecucion_actual()
             
-            # Consultar estado actual en Supabase
-            url = f"{SUPABASE_URL}/rest/v1/sanciones"
-            params = {
-                'select': 'id,comentarios_rrhh,updated_at',
-                'id': f'in.({",".join(ids_sanciones)})'
-            }
+            print(f"🔍 Validando disponibilidad de {len(ids_sanciones)} sanciones...")
             
-            response = requests.get(
-                url, 
-                headers=self.supabase_headers, 
-                params=params,
-                timeout=REQUEST_TIMEOUT
-            )
+            lotes = [ids_sanciones[i:i + VALIDACION_LOTE_IDS]
+                     for i in range(0, len(ids_sanciones), VALIDACION_LOTE_IDS)]
             
-            if response.status_code != 200:
-                print(f"❌ Error validando disponibilidad: {response.status_code}")
-                return ids_sanciones, []  # Asumir disponibles si falla la validación
+            estado_actual = {}
+            sin_validar = set()
             
-            sanciones_actuales = response.json()
+            with ThreadPoolExecutor(max_workers=min(MAX_THREADS, len(lotes))) as executor:
+                futures = {executor.submit(self._consultar_estado_lote, lote, ejecucion): lote for lote in lotes}
+                
+                for future in as_completed(futures):
+                    sanciones_actuales = future.result()
+                    if sanciones_actuales is None:
+                        # Asumir disponibles si falla la validación de este lote
+                        sin_validar.update(futures[future])
+                        continue
+                    
+                    for sancion in sanciones_actuales:
+                        estado_actual[sancion['id']] = sancion
             
             disponibles = []
             no_disponibles = []
             
             for id_sancion in ids_sanciones:
-                sancion_actual = next(
-                    (s for s in sanciones_actuales if s['id'] == id_sancion), 
-                    None
-                )
+                sancion_actual = estado_actual.get(id_sancion)
                 
-                if sancion_actual and not sancion_actual.get('comentarios_rrhh'):
+                if id_sancion in sin_validar or (sancion_actual and not sancion_actual.get('comentarios_rrhh')):
                     disponibles.append(id_sancion)
                 else:
                     no_disponibles.append(id_sancion)
             
+            if sin_validar:
+                print(f"⚠️ {len(sin_validar)} sanciones no se pudieron validar, se asumen disponibles")
+            
             if no_disponibles:
                 print(f"⚠️ {len(no_disponibles)} sanciones ya fueron procesadas por otro usuario")
             
@@ -313,10 +1588,50 @@ class ProcesadorRRHH:
             print(f"❌ Error validando disponibilidad: {e}")
             return ids_sanciones, []  # En caso de error, asumir disponibles
     
+    def _consultar_estado_lote(self, ids_lote: List[str],
+                               ejecucion: Optional[ContextoEjecucion] = None) -> Optional[List[Dict]]:
+        """Estado actual en Supabase de un lote de ids (None si la consulta falla)"""
+        try:
+            url = f"{SUPABASE_URL}/rest/v1/sanciones"
+            params = {
+                'select': 'id,comentarios_rrhh,updated_at',
+                'id': f'in.({",".join(ids_lote)})'
+            }
+            
+            # El contexto es por hilo: activarlo en el hilo del pool
+            with self.reintentos.contexto(ejecucion):
+                response = self._supabase(
+                    'GET',
+                    url,
+                    params=params
+                )
+            
+            if response.status_code != 200:
+                print(f"❌ Error validando disponibilidad: {response.status_code}")
+                return None
+            
+            return response.json()
+            
+        except Exception as e:
+            print(f"❌ Error validando lote de {len(ids_lote)} sanciones: {e}")
+            return None
+    
+    @staticmethod
+    def _filtro_disponible_o_propia(comentario: str) -> str:
+        """
+        🔒 Filtro del PATCH condicional: sin procesar, o ya marcada con este mismo comentario.
+        Si un intento anterior se aplicó pero su respuesta se perdió, el reintento la devuelve
+        como propia en lugar de reportar un falso conflicto.
+        """
+        literal = comentario.replace('\\', '\\\\').replace('"', '\\"')
+        return f'(comentarios_rrhh.is.null,comentarios_rrhh.eq."{literal}")'
+
     def procesar_sancion_individual(self, sancion: Dict, usuario: str) -> Tuple[bool, str]:
         """
         ⚡ OPTIMIZADO: Procesar una sanción individual con mejor manejo de errores
-        Retorna: (éxito, mensaje)
+        🔒 PATCH condicional (sin procesar o ya con este comentario): si otro usuario la tomó no se sobrescribe
+        🔁 Los fallos transitorios se reintentan con la política de reintentos
+        Retorna: (éxito, mensaje) - mensaje MSG_CONCURRENCIA si ya estaba procesada
         """
         sancion_id = sancion['id']
         inicio_tiempo = time.time()
@@ -329,22 +1644,39 @@ class ProcesadorRRHH:
             
             # Actualizar en Supabase
             url = f"{SUPABASE_URL}/rest/v1/sanciones"
-            params = {'id': f'eq.{sancion_id}'}
+            params = {
+                'id': f'eq.{sancion_id}',
+                'or': self._filtro_disponible_o_propia(comentario),
+                'select': 'id'
+            }
             data = {'comentarios_rrhh': comentario}
             
-            response = requests.patch(
-                url, 
-                headers=self.supabase_headers, 
+            response = self._supabase(
+                'PATCH',
+                url,
                 params=params, 
                 json=data,
-                timeout=REQUEST_TIMEOUT
+                reintentable=True  # Condicional: repetirlo no pisa a otro usuario
             )
             
-            if response.status_code not in [200, 204]:
+            # 204 sin cuerpo no dice si el filtro condicional coincidió: no se puede dar por tomada
+            if response.status_code == 204:
+                print(f"⚠️ {sancion_id[:8]}: {MSG_RESULTADO_DESCONOCIDO}")
+                return False, MSG_RESULTADO_DESCONOCIDO
+            
+            if response.status_code != 200:
                 error_msg = f"Error Supabase: {response.status_code}"
                 print(f"❌ {error_msg}")
+                if response.status_code in ESTADOS_SIN_SERVICIO and \
+                        self._encolar_outbox([sancion], comentario, usuario, error_msg):
+                    return False, MSG_EN_COLA
                 return False, error_msg
             
+            # Sin filas devueltas: el filtro no coincidió, otro usuario la procesó antes
+            if not response.json():
+                print(f"🔒 {sancion_id[:8]} ya fue procesada por otro usuario")
+                return False, MSG_CONCURRENCIA
+            
             # Guardar en local para historial (sin afectar lógica principal)
             tiempo_procesamiento = time.time() - inicio_tiempo
             self._guardar_procesada_local(sancion, usuario, tiempo_procesamiento)
@@ -352,263 +1684,686 @@ class ProcesadorRRHH:
             print(f"✅ Procesada {sancion_id[:8]} en {tiempo_procesamiento:.2f}s")
             return True, "Éxito"
             
-        except requests.Timeout:
-            error_msg = f"Timeout ({REQUEST_TIMEOUT}s)"
+        except PlazoAgotado as e:
+            print(f"⏱️ {e}")
+            return False, str(e)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            error_msg = f"Timeout ({REQUEST_TIMEOUT}s)" if isinstance(e, requests.Timeout) else "Sin conexión"
             print(f"⏱️ {error_msg}")
+            # 📤 Supabase inalcanzable: guardar la escritura para reenviarla al reconectar
+            if self._encolar_outbox([sancion], comentario, usuario, error_msg):
+                return False, MSG_EN_COLA
             return False, error_msg
         except Exception as e:
             error_msg = f"Error: {str(e)}"
             print(f"❌ Error procesando {sancion_id[:8]}: {e}")
             return False, error_msg
-    
-    def _guardar_procesada_local(self, sancion: Dict, usuario: str, tiempo_procesamiento: float):
-        """Guardar en base local para historial COMPATIBLE con DB existente"""
+
+    def procesar_lote_bulk(self, sanciones: List[Dict], usuario: str) -> Tuple[int, int, List[str], int]:
+        """
+        ⚡ NUEVO: Procesar un lote completo con un solo PATCH (id=in.(...))
+        🔒 Condicional (sin procesar o ya con este comentario): las filas devueltas por
+        return=representation son las que este cliente tomó; las demás ya estaban procesadas
+        por otro usuario. Un 204 sin cuerpo no confirma nada y cuenta como fallo.
+        🔁 Los fallos transitorios se reintentan.
+        Retorna: (exitosas, fallidas, errores, conflictos)
+        """
+        if not sanciones:
+            return 0, 0, [], 0
+
+        inicio_tiempo = time.time()
+        ids_lote = [s['id'] for s in sanciones]
+
         try:
-            with sqlite3.connect(DB_LOCAL) as conn:
-                cursor = conn.cursor()
-                
-                # 🔄 COMPATIBLE: Verificar qué columnas existen
-                cursor.execute("PRAGMA table_info(procesadas)")
-                columnas_existentes = [row[1] for row in cursor.fetchall()]
-                
-                # Insertar con columnas básicas (siempre existen)
-                if 'tiempo_procesamiento' in columnas_existentes and 'fecha_original' in columnas_existentes:
-                    # Base de datos nueva con columnas adicionales
-                    cursor.execute('''
-                        INSERT OR REPLACE INTO procesadas (
-                            id, usuario, empleado_cod, empleado_nombre, 
-                            tipo_sancion, fecha_original, tiempo_procesamiento
-                        ) VALUES (?, ?, ?, ?, ?, ?, ?)
-                    ''', (
-                        sancion['id'],
-                        usuario,
-                        sancion.get('empleado_cod'),
-                        sancion.get('empleado_nombre'),
-                        sancion.get('tipo_sancion'),
-                        sancion.get('fecha'),
-                        tiempo_procesamiento
-                    ))
+            fecha_actual = datetime.now().strftime("%Y-%m-%d %H:%M")
+            comentario = f"{MSG_PROCESADO} - {fecha_actual} - {usuario}"
+
+            print(f"🔄 Procesando lote bulk de {len(ids_lote)} sanciones...")
+
+            url = f"{SUPABASE_URL}/rest/v1/sanciones"
+            params = {
+                'id': f'in.({",".join(ids_lote)})',
+                'or': self._filtro_disponible_o_propia(comentario),
+                'select': 'id'
+            }
+            data = {'comentarios_rrhh': comentario}
+
+            response = self._supabase(
+                'PATCH',
+                url,
+                params=params,
+                json=data,
+                reintentable=True  # Condicional: repetirlo no pisa a otro usuario
+            )
+
+            # 204 sin cuerpo no dice qué filas coincidieron: ninguna se da por tomada
+            if response.status_code == 204:
+                print(f"⚠️ Lote bulk: {MSG_RESULTADO_DESCONOCIDO}")
+                return 0, len(sanciones), [f"{sid[:8]}: {MSG_RESULTADO_DESCONOCIDO}" for sid in ids_lote], 0
+
+            if response.status_code != 200:
+                error_msg = f"Error Supabase: {response.status_code}"
+                print(f"❌ {error_msg} (lote bulk)")
+                if response.status_code in ESTADOS_SIN_SERVICIO and \
+                        self._encolar_outbox(sanciones, comentario, usuario, error_msg):
+                    error_msg = MSG_EN_COLA
+                return 0, len(sanciones), [f"{sid[:8]}: {error_msg}" for sid in ids_lote], 0
+
+            ids_actualizados = {fila['id'] for fila in response.json()}
+
+            tiempo_procesamiento = (time.time() - inicio_tiempo) / len(sanciones)
+
+            exitosas = 0
+            errores = []
+            for sancion in sanciones:
+                if sancion['id'] in ids_actualizados:
+                    self._guardar_procesada_local(sancion, usuario, tiempo_procesamiento)
+                    exitosas += 1
                 else:
-                    # Base de datos original con estructura básica
-                    cursor.execute('''
-                        INSERT OR REPLACE INTO procesadas (
-                            id, usuario, empleado_cod, empleado_nombre, tipo_sancion
-                        ) VALUES (?, ?, ?, ?, ?)
-                    ''', (
-                        sancion['id'],
-                        usuario,
-                        sancion.get('empleado_cod'),
-                        sancion.get('empleado_nombre'),
-                        sancion.get('tipo_sancion')
-                    ))
-                
-                conn.commit()
-                
+                    errores.append(f"{sancion['id'][:8]}: {MSG_CONCURRENCIA}")
+
+            conflictos = len(sanciones) - exitosas
+            if conflictos:
+                print(f"🔒 Lote bulk: {conflictos} sanciones ya procesadas por otro usuario")
+
+            print(f"✅ Lote bulk: {exitosas}/{len(sanciones)} en {time.time() - inicio_tiempo:.2f}s")
+            return exitosas, conflictos, errores, conflictos
+
+        except PlazoAgotado as e:
+            print(f"⏱️ {e} (lote bulk)")
+            return 0, len(sanciones), [f"{sid[:8]}: {e}" for sid in ids_lote], 0
+        except (requests.ConnectionError, requests.Timeout) as e:
+            error_msg = f"Timeout ({REQUEST_TIMEOUT}s)" if isinstance(e, requests.Timeout) else "Sin conexión"
+            print(f"⏱️ {error_msg} (lote bulk)")
+            # 📤 Supabase inalcanzable: guardar las escrituras para reenviarlas al reconectar
+            if self._encolar_outbox(sanciones, comentario, usuario, error_msg):
+                error_msg = MSG_EN_COLA
+            return 0, len(sanciones), [f"{sid[:8]}: {error_msg}" for sid in ids_lote], 0
+        except Exception as e:
+            error_msg = f"Error: {str(e)}"
+            print(f"❌ Error procesando lote bulk: {e}")
+            return 0, len(sanciones), [f"{sid[:8]}: {error_msg}" for sid in ids_lote], 0
+
+    def _encolar_outbox(self, sanciones: List[Dict], comentario: str, usuario: str, motivo: str) -> int:
+        """
+        📤 NUEVO: Guardar en el outbox local escrituras que no llegaron a Supabase
+        Retorna cuántas quedaron encoladas (0 si no hay outbox o falló la base local).
+        """
+        if not self.capacidades.outbox:
+            return 0
+        try:
+            with self.db.conexion() as conn:
+                conn.executemany('''
+                    INSERT OR REPLACE INTO outbox_procesamiento (id, comentario, usuario, datos, ultimo_error)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', [(s['id'], comentario, usuario, json.dumps(s, ensure_ascii=False), motivo)
+                      for s in sanciones])
+        except Exception as e:
+            print(f"❌ Error guardando en outbox: {e}")
+            return 0
+
+        ejecucion = self.reintentos.ejecucion_actual()
+        if ejecucion:
+            ejecucion.sumar_en_cola(len(sanciones))
+        print(f"📤 {len(sanciones)} sanciones guardadas en el outbox ({motivo})")
+        return len(sanciones)
+
+    def _ids_outbox(self) -> set:
+        """Ids con escritura pendiente en el outbox"""
+        if not self.capacidades.outbox:
+            return set()
+        try:
+            with self.db.conexion() as conn:
+                return {fila[0] for fila in conn.execute('SELECT id FROM outbox_procesamiento')}
+        except Exception as e:
+            print(f"⚠️ Error leyendo outbox: {e}")
+            return set()
+
+    def profundidad_outbox(self) -> int:
+        """📤 Escrituras pendientes de enviar a Supabase"""
+        if not self.capacidades.outbox:
+            return 0
+        try:
+            with self.db.conexion() as conn:
+                return conn.execute('SELECT COUNT(*) FROM outbox_procesamiento').fetchone()[0]
+        except Exception as e:
+            print(f"⚠️ Error contando outbox: {e}")
+            return 0
+
+    def reenviar_outbox(self, tamano_lote: int = BATCH_SIZE) -> Dict:
+        """
+        📤 NUEVO: Reenviar en bloque las escrituras del outbox al volver la conexión
+        Un PATCH condicional por lote y comentario (sin procesar o ya con ese comentario):
+        las filas devueltas pasan al historial local; las demás las tomó otro usuario.
+        Ante un fallo de conexión se detiene y deja el resto para el próximo intento.
+        Un error que reintentar no arregla (4xx) o OUTBOX_MAX_INTENTOS respuestas fallidas
+        descartan la fila: sale del outbox y vuelve a las pendientes para procesarla a mano.
+        """
+        resumen = {'enviadas': 0, 'conflictos': 0, 'pendientes': 0, 'tiempo': 0.0, 'filas_por_segundo': 0.0,
+                   'descartadas': 0, 'detalle_descartadas': []}
+        if not self.capacidades.outbox or not self._lock_outbox.acquire(blocking=False):
+            resumen['pendientes'] = self.profundidad_outbox()
+            return resumen
+
+        inicio = time.time()
+        try:
+            with self.db.conexion() as conn:
+                filas = conn.execute('''
+                    SELECT comentario, usuario, datos FROM outbox_procesamiento ORDER BY creado, id
+                ''').fetchall()
+
+            # Un PATCH solo puede escribir un valor: agrupar por comentario
+            grupos = {}
+            for comentario, usuario, datos in filas:
+                grupos.setdefault((comentario, usuario), []).append(json.loads(datos))
+
+            url = f"{SUPABASE_URL}/rest/v1/sanciones"
+            sin_conexion = False
+            with self.reintentos.contexto(ContextoEjecucion(PLAZO_PROCESAMIENTO)):
+                for (comentario, usuario), sanciones in grupos.items():
+                    for i in range(0, len(sanciones), tamano_lote):
+                        lote = sanciones[i:i + tamano_lote]
+                        ids_lote = [s['id'] for s in lote]
+                        inicio_lote = time.time()
+                        try:
+                            response = self._supabase(
+                                'PATCH',
+                                url,
+                                params={
+                                    'id': f'in.({",".join(ids_lote)})',
+                                    'or': self._filtro_disponible_o_propia(comentario),
+                                    'select': 'id'
+                                },
+                                json={'comentarios_rrhh': comentario},
+                                reintentable=True
+                            )
+                        except (requests.ConnectionError, requests.Timeout) as e:
+                            # Sin conexión no cuenta como intento: la fila espera lo que dure el corte
+                            self._marcar_intento_outbox(ids_lote, str(e), contar=False)
+                            sin_conexion = True
+                            break
+
+                        if response.status_code == 204:
+                            # Sin cuerpo no se sabe qué filas coincidieron: quedan en el outbox
+                            self._marcar_intento_outbox(ids_lote, MSG_RESULTADO_DESCONOCIDO, resumen)
+                            continue
+
+                        if response.status_code != 200:
+                            error_msg = f"Error Supabase: {response.status_code}"
+                            if response.status_code in ESTADOS_SIN_SERVICIO:
+                                self._marcar_intento_outbox(ids_lote, error_msg, contar=False)
+                                sin_conexion = True
+                                break
+                            if self._error_definitivo(response.status_code):
+                                self._descartar_outbox(ids_lote, error_msg, resumen)
+                            else:
+                                self._marcar_intento_outbox(ids_lote, error_msg, resumen)
+                            continue
+
+                        ids_actualizados = {fila['id'] for fila in response.json()}
+
+                        tiempo_fila = (time.time() - inicio_lote) / len(lote)
+                        for sancion in lote:
+                            if sancion['id'] in ids_actualizados:
+                                self._guardar_procesada_local(sancion, usuario, tiempo_fila)
+
+                        with self.db.conexion() as conn:
+                            conn.execute(
+                                f"DELETE FROM outbox_procesamiento WHERE id IN ({','.join('?' * len(ids_lote))})",
+                                ids_lote
+                            )
+                        resumen['enviadas'] += len(ids_actualizados)
+                        resumen['conflictos'] += len(lote) - len(ids_actualizados)
+
+                    if sin_conexion:
+                        break
+
+            self.escritor.flush()
+        finally:
+            self._lock_outbox.release()
+
+        resumen['tiempo'] = time.time() - inicio
+        resumen['filas_por_segundo'] = (resumen['enviadas'] + resumen['conflictos']) / max(resumen['tiempo'], 1e-6)
+        resumen['pendientes'] = self.profundidad_outbox()
+        self.resumen_outbox = resumen
+
+        if resumen['enviadas'] or resumen['conflictos'] or resumen['descartadas']:
+            self.log_operacion(
+                "sistema",
+                "REENVIO_OUTBOX",
+                f"{len(filas)} escrituras en outbox",
+                f"Enviadas: {resumen['enviadas']}, Conflictos: {resumen['conflictos']}, "
+                f"Descartadas: {resumen['descartadas']}, "
+                f"Pendientes: {resumen['pendientes']}, Tiempo: {resumen['tiempo']:.2f}s"
+            )
+        print(f"📤 Outbox: {resumen['enviadas']} enviadas, {resumen['conflictos']} ya procesadas por otro usuario, "
+              f"{resumen['descartadas']} descartadas, "
+              f"{resumen['pendientes']} pendientes ({resumen['filas_por_segundo']:.1f} filas/s)")
+        return resumen
+
+    @staticmethod
+    def _error_definitivo(status: int) -> bool:
+        """4xx salvo 408/429: reintentar el mismo PATCH no lo va a arreglar (id inválido, clave, conflicto)"""
+        return 400 <= status < 500 and status not in (408, 429)
+
+    def _descartar_outbox(self, ids: List[str], motivo: str, resumen: Dict):
+        """📤 Sacar filas del outbox: vuelven a las pendientes y se informan en el resumen"""
+        try:
+            with self.db.conexion() as conn:
+                conn.execute(
+                    f"DELETE FROM outbox_procesamiento WHERE id IN ({','.join('?' * len(ids))})",
+                    ids
+                )
+        except Exception as e:
+            print(f"⚠️ Error descartando del outbox: {e}")
+            return
+
+        resumen['descartadas'] += len(ids)
+        resumen['detalle_descartadas'].extend(f"{sid[:8]}: {motivo}" for sid in ids)
+        print(f"⚠️ Outbox: {len(ids)} escrituras descartadas ({motivo}) - vuelven a pendientes")
+
+
+    def _marcar_intento_outbox(self, ids: List[str], error: str, resumen: Optional[Dict] = None,
+                               contar: bool = True):
+        """Anotar el error; con `contar`, sumar un intento y descartar las que llegan a OUTBOX_MAX_INTENTOS"""
+        marcas = ','.join('?' * len(ids))
+        try:
+            with self.db.conexion() as conn:
+                conn.execute(
+                    f"UPDATE outbox_procesamiento SET intentos = intentos + {1 if contar else 0}, "
+                    f"ultimo_error = ? WHERE id IN ({marcas})",
+                    [error] + ids
+                )
+                agotadas = [fila[0] for fila in conn.execute(
+                    f"SELECT id FROM outbox_procesamiento WHERE intentos >= ? AND id IN ({marcas})",
+                    [OUTBOX_MAX_INTENTOS] + ids
+                )] if contar else []
         except Exception as e:
-            print(f"⚠️ Error guardando local (no crítico): {e}")
+            print(f"⚠️ Error actualizando outbox: {e}")
+            return
+
+        if agotadas and resumen is not None:
+            self._descartar_outbox(agotadas, f"{error} ({OUTBOX_MAX_INTENTOS} intentos)", resumen)
+
+    def _guardar_procesada_local(self, sancion: Dict, usuario: str, tiempo_procesamiento: float):
+        """📝 Encolar en el escritor diferido el registro local para historial"""
+        self.escritor.encolar((
+            sancion['id'],
+            usuario,
+            sancion.get('empleado_cod'),
+            sancion.get('empleado_nombre'),
+            sancion.get('tipo_sancion'),
+            sancion.get('fecha'),
+            tiempo_procesamiento
+        ))
+
+    def _insertar_procesadas_local(self, filas: List[tuple]):
+        """
+        Guardar en base local para historial COMPATIBLE con DB existente
+        Llamado por el escritor diferido con un lote de filas; una sola transacción.
+        """
+        with self.db.conexion() as conn:
+            cursor = conn.cursor()
+            
+            # 🔄 COMPATIBLE: Columnas según capacidades detectadas al iniciar
+            if self.capacidades.procesadas_extendida:
+                # Base de datos nueva con columnas adicionales
+                cursor.executemany('''
+                    INSERT OR REPLACE INTO procesadas (
+                        id, usuario, empleado_cod, empleado_nombre, 
+                        tipo_sancion, fecha_original, tiempo_procesamiento
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?)
+                ''', filas)
+            else:
+                # Base de datos original con estructura básica
+                cursor.executemany('''
+                    INSERT OR REPLACE INTO procesadas (
+                        id, usuario, empleado_cod, empleado_nombre, tipo_sancion
+                    ) VALUES (?, ?, ?, ?, ?)
+                ''', [fila[:5] for fila in filas])
     
-    def procesar_multiples_sanciones(self, sanciones: List[Dict], usuario: str, 
-                                   callback_progreso: Optional[Callable] = None) -> Tuple[int, int, List[str]]:
+    def procesar_multiples_sanciones(self, sanciones: List[Dict], usuario: str,
+                                   callback_progreso: Optional[Callable] = None,
+                                   modo_bulk: bool = MODO_BULK,
+                                   validar_antes: bool = VALIDAR_ANTES_DE_PROCESAR,
+                                   seguimiento: Optional[SeguimientoProgreso] = None) -> Tuple[int, int, List[str]]:
         """
         ⚡ SÚPER OPTIMIZADO: Procesamiento por lotes con threading y validación de concurrencia
+        Con modo_bulk cada lote se envía en un único PATCH en lugar de uno por sanción.
+        🔒 Los PATCH son condicionales, por lo que la validación previa (validar_antes) es opcional.
+        🎚️ Filas (o bloques en bulk) se despachan según el límite del ControladorConcurrencia.
+        📊 `seguimiento` acumula el avance de todos los lotes (callback_progreso: mensajes de fase).
+        ⏱️ Toda la ejecución (reintentos incluidos) está limitada a PLAZO_PROCESAMIENTO segundos.
+        El detalle queda en self.resumen_ultima_ejecucion (incluye conflictos).
         """
         if not sanciones:
             return 0, 0, []
         
         print(f"🚀 Iniciando procesamiento optimizado de {len(sanciones)} sanciones...")
         inicio_total = time.time()
+        if seguimiento is None:
+            seguimiento = SeguimientoProgreso()
+        seguimiento.total = len(sanciones)
+        # ⏱️ Plazo y contador de reintentos de esta ejecución, compartidos por todos los hilos
+        ejecucion = ContextoEjecucion(PLAZO_PROCESAMIENTO)
+        # 🪣 Foto del limitador para informar solo las esperas de esta ejecución
+        limitador_inicio = self.metricas_limitador()
         
-        # 1. VALIDAR DISPONIBILIDAD (prevenir concurrencia)
-        ids_sanciones = [s['id'] for s in sanciones]
-        ids_disponibles, ids_no_disponibles = self.validar_disponibilidad_sanciones(ids_sanciones)
-        
-        if callback_progreso:
-            callback_progreso(f"Validadas: {len(ids_disponibles)} disponibles, {len(ids_no_disponibles)} ocupadas")
+        # 1. VALIDAR DISPONIBILIDAD (opcional: ahorra PATCH de filas ya tomadas)
+        if validar_antes:
+            ids_sanciones = [s['id'] for s in sanciones]
+            ids_disponibles, ids_no_disponibles = self.validar_disponibilidad_sanciones(ids_sanciones, ejecucion)
+            
+            if callback_progreso:
+                callback_progreso(f"Validadas: {len(ids_disponibles)} disponibles, {len(ids_no_disponibles)} ocupadas")
+            
+            # Filtrar solo sanciones disponibles
+            ids_disponibles = set(ids_disponibles)
+            sanciones_disponibles = [s for s in sanciones if s['id'] in ids_disponibles]
+        else:
+            ids_no_disponibles = []
+            sanciones_disponibles = list(sanciones)
         
-        # Filtrar solo sanciones disponibles
-        sanciones_disponibles = [s for s in sanciones if s['id'] in ids_disponibles]
+        if ids_no_disponibles:
+            seguimiento.registrar(fallidas=len(ids_no_disponibles), conflictos=len(ids_no_disponibles))
         
         if not sanciones_disponibles:
+            self.resumen_ultima_ejecucion = {
+                'solicitadas': len(sanciones), 'exitosas': 0, 'fallidas': len(sanciones),
+                'conflictos': len(ids_no_disponibles), 'tiempo': time.time() - inicio_total,
+                'reintentos': ejecucion.reintentos,
+                'en_cola': 0
+            }
             return 0, len(sanciones), ["Todas las sanciones ya fueron procesadas por otros usuarios"]
         
         exitosas = 0
-        fallidas = 0
+        fallidas = len(ids_no_disponibles)
+        conflictos = len(ids_no_disponibles)
         errores = []
         
-        # 2. PROCESAMIENTO EN LOTES CON THREADING
-        def procesar_lote(lote_sanciones):
-            lote_exitosas = 0
-            lote_fallidas = 0
-            lote_errores = []
-            
-            for sancion in lote_sanciones:
-                éxito, mensaje = self.procesar_sancion_individual(sancion, usuario)
-                if éxito:
-                    lote_exitosas += 1
-                else:
-                    lote_fallidas += 1
-                    lote_errores.append(f"{sancion['id'][:8]}: {mensaje}")
-                
-                # Callback de progreso
-                if callback_progreso:
-                    callback_progreso(f"Procesadas: {lote_exitosas + lote_fallidas}/{len(sanciones_disponibles)}")
+        # 2. PROCESAMIENTO CON CONCURRENCIA ADAPTATIVA
+        def procesar_unidad(unidad):
+            if modo_bulk:
+                inicio_lote = time.time()
+                resultado = self.procesar_lote_bulk(unidad, usuario)
+                # Cada fila del bloque tarda lo que tarda el PATCH completo
+                seguimiento.concurrencia = self.concurrencia.limite
+                seguimiento.registrar(exitosas=resultado[0], fallidas=resultado[1], conflictos=resultado[3],
+                                      latencias=[time.time() - inicio_lote] * len(unidad))
+                return resultado
+
+            sancion = unidad[0]
+            inicio_fila = time.time()
+            éxito, mensaje = self.procesar_sancion_individual(sancion, usuario)
+            conflicto = not éxito and mensaje == MSG_CONCURRENCIA
+            errores_fila = [] if éxito else [f"{sancion['id'][:8]}: {mensaje}"]
             
-            return lote_exitosas, lote_fallidas, lote_errores
+            seguimiento.concurrencia = self.concurrencia.limite
+            seguimiento.registrar(exitosas=int(éxito), fallidas=int(not éxito), conflictos=int(conflicto),
+                                  latencias=[time.time() - inicio_fila])
+            return int(éxito), int(not éxito), errores_fila, int(conflicto)
+        
+        def ejecutar(unidad):
+            try:
+                with self.reintentos.contexto(ejecucion):
+                    return procesar_unidad(unidad)
+            finally:
+                self.concurrencia.liberar()
         
-        # Dividir en lotes
-        lotes = [sanciones_disponibles[i:i + BATCH_SIZE] 
-                for i in range(0, len(sanciones_disponibles), BATCH_SIZE)]
+        # Unidades de trabajo: filas sueltas, o bloques repartidos entre las ranuras disponibles
+        if modo_bulk:
+            por_ranura = -(-len(sanciones_disponibles) // self.concurrencia.limite)
+            tamano = min(BATCH_SIZE, max(BLOQUE_BULK_MINIMO, por_ranura))
+        else:
+            tamano = 1
+        unidades = [sanciones_disponibles[i:i + tamano]
+                    for i in range(0, len(sanciones_disponibles), tamano)]
         
-        print(f"📦 Procesando en {len(lotes)} lotes de máximo {BATCH_SIZE} sanciones")
+        modo = f"bulk (1 PATCH por bloque de {tamano})" if modo_bulk else "individual"
+        print(f"📦 Procesando {len(unidades)} unidades - modo {modo} - "
+              f"concurrencia inicial {self.concurrencia.limite}")
         
-        # Procesar lotes con ThreadPoolExecutor
-        with ThreadPoolExecutor(max_workers=min(MAX_THREADS, len(lotes))) as executor:
-            futures = {executor.submit(procesar_lote, lote): i for i, lote in enumerate(lotes)}
+        # El despacho espera una ranura del controlador antes de enviar cada unidad
+        with ThreadPoolExecutor(max_workers=min(CONCURRENCIA_MAX, len(unidades))) as executor:
+            futures = {}
+            for unidad in unidades:
+                self.concurrencia.adquirir()
+                futures[executor.submit(ejecutar, unidad)] = unidad
             
             for future in as_completed(futures):
                 try:
-                    lote_exitosas, lote_fallidas, lote_errores = future.result()
-                    exitosas += lote_exitosas
-                    fallidas += lote_fallidas
-                    errores.extend(lote_errores)
-                    
-                    if callback_progreso:
-                        callback_progreso(f"Lote completado. Total: {exitosas + fallidas}/{len(sanciones_disponibles)}")
+                    u_exitosas, u_fallidas, u_errores, u_conflictos = future.result()
+                    exitosas += u_exitosas
+                    fallidas += u_fallidas
+                    conflictos += u_conflictos
+                    errores.extend(u_errores)
                         
                 except Exception as e:
                     print(f"❌ Error en lote: {e}")
-                    fallidas += BATCH_SIZE
+                    tamano_unidad = len(futures[future])
+                    fallidas += tamano_unidad
+                    seguimiento.registrar(fallidas=tamano_unidad)
                     errores.append(f"Error en lote: {str(e)}")
         
+        # 📝 Asegurar que el historial local quede escrito antes de retornar
+        no_guardadas = self.escritor.flush()
+        if no_guardadas:
+            print(f"⚠️ {len(no_guardadas)} sanciones procesadas no se guardaron en el historial local")
+            errores.append(f"Historial local: {len(no_guardadas)} sanciones no se guardaron "
+                           f"({', '.join(fila[0][:8] for fila in no_guardadas[:5])})")
+        
         tiempo_total = time.time() - inicio_total
+        rendimiento = seguimiento.resumen()
+        self.resumen_ultima_ejecucion = {
+            'solicitadas': len(sanciones), 'exitosas': exitosas, 'fallidas': fallidas,
+            'conflictos': conflictos, 'tiempo': tiempo_total,
+            'filas_por_segundo': rendimiento['filas_por_segundo'],
+            'p50': rendimiento['p50'], 'p95': rendimiento['p95'],
+            'concurrencia_final': self.concurrencia.limite,
+            'reintentos': ejecucion.reintentos,
+            'en_cola': ejecucion.en_cola,
+            'limitador': self.metricas_limitador(desde=limitador_inicio)
+        }
         
         # Log de la operación
         self.log_operacion(
             usuario, 
             "PROCESAMIENTO_MASIVO", 
-            f"{len(sanciones)} sanciones solicitadas, {len(sanciones_disponibles)} procesadas",
-            f"Exitosas: {exitosas}, Fallidas: {fallidas}, Tiempo: {tiempo_total:.2f}s"
+            f"{len(sanciones)} sanciones solicitadas, {len(sanciones_disponibles)} enviadas",
+            f"Exitosas: {exitosas}, Fallidas: {fallidas}, Conflictos: {conflictos}, Tiempo: {tiempo_total:.2f}s, "
+            f"Concurrencia final: {self.concurrencia.limite}, Reintentos: {ejecucion.reintentos}, "
+            f"En outbox: {ejecucion.en_cola}"
         )
         
         print(f"🎯 Procesamiento completado en {tiempo_total:.2f}s")
         print(f"✅ Exitosas: {exitosas}")
         print(f"❌ Fallidas: {fallidas}")
-        print(f"⚠️ No disponibles: {len(ids_no_disponibles)}")
+        print(f"🔒 Ya procesadas por otro usuario: {conflictos}")
+        print(f"🎚️ Concurrencia final: {self.concurrencia.limite}")
+        print(f"🔁 Reintentos: {ejecucion.reintentos}")
+        if ejecucion.en_cola:
+            print(f"📤 Guardadas en el outbox (sin conexión): {ejecucion.en_cola}")
+        escrituras = self.resumen_ultima_ejecucion['limitador']['escrituras']
+        print(f"🪣 Escrituras de esta ejecución que esperaron token: {escrituras['esperaron']}/{escrituras['peticiones']} "
+              f"(p95 {escrituras['espera_p95'] * 1000:.0f} ms, máx {escrituras['espera_max'] * 1000:.0f} ms)")
         
         return exitosas, fallidas, errores
     
+    def categoria_de_tipo(self, tipo_sancion: Optional[str]) -> str:
+        """Categoría de un tipo de sanción (las no listadas van a "Resto")"""
+        tipo = (tipo_sancion or '').upper()
+        for categoria, tipos in CATEGORIAS.items():
+            if tipo in tipos:
+                return categoria
+        return "Resto"
+    
     def categorizar_sanciones(self, sanciones: List[Dict]) -> Dict[str, List[Dict]]:
         """Organizar sanciones por categorías"""
         categorizadas = {categoria: [] for categoria in CATEGORIAS.keys()}
         
         for sancion in sanciones:
-            tipo = sancion.get('tipo_sancion', '').upper()
-            categorizada = False
-            
-            for categoria, tipos in CATEGORIAS.items():
-                if tipo in tipos:
-                    categorizadas[categoria].append(sancion)
-                    categorizada = True
-                    break
-            
-            if not categorizada:
-                categorizadas["Resto"].append(sancion)
+            categorizadas[self.categoria_de_tipo(sancion.get('tipo_sancion'))].append(sancion)
         
         return categorizadas
     
-    def obtener_procesadas_completas(self) -> List[Dict]:
+    def obtener_procesadas_completas(self, sincronizar: bool = True) -> List[Dict]:
         """
-        ⚡ OPTIMIZADO: Obtener historial de procesadas desde Supabase
+        ⚡ OPTIMIZADO: Obtener TODO el historial de procesadas (sin límite de filas)
+        Con sincronizar=True primero trae solo los cambios (delta) desde Supabase.
+        Para recorrer historiales grandes con memoria acotada usar iterar_procesadas().
         """
         try:
             print("📚 Consultando historial de sanciones procesadas...")
             
-            url = f"{SUPABASE_URL}/rest/v1/sanciones"
-            params = {
-                'select': '*',
-                'comentarios_rrhh': 'not.is.null',
-                'order': 'updated_at.desc',
-                'limit': 1000  # Limitar para rendimiento
-            }
+            if sincronizar:
+                try:
+                    self.sincronizar_espejo()
+                except Exception as e:
+                    print(f"⚠️ No se pudo sincronizar el espejo local: {e}")
             
-            response = requests.get(
-                url, 
-                headers=self.supabase_headers, 
-                params=params,
-                timeout=REQUEST_TIMEOUT
-            )
+            procesadas = []
+            for pagina in self.iterar_procesadas():
+                procesadas.extend(pagina)
             
-            if response.status_code == 200:
-                procesadas = response.json()
-                
-                # Enriquecer con datos locales si existen
-                self._enriquecer_con_datos_locales(procesadas)
-                
-                print(f"📊 Historial obtenido: {len(procesadas)} sanciones procesadas")
-                return procesadas
-            else:
-                print(f"❌ Error obteniendo historial: {response.status_code}")
-                return []
+            print(f"📊 Historial obtenido: {len(procesadas)} sanciones procesadas")
+            return procesadas
                 
         except Exception as e:
             print(f"❌ Error obteniendo procesadas: {e}")
             return []
     
     def _enriquecer_con_datos_locales(self, sanciones: List[Dict]):
-        """Agregar datos locales de procesamiento si existen COMPATIBLE"""
+        """
+        Agregar datos locales de procesamiento si existen COMPATIBLE
+        ⚡ Solo consulta los ids recibidos (IN por lotes sobre la clave primaria)
+        """
         try:
-            with sqlite3.connect(DB_LOCAL) as conn:
-                cursor = conn.cursor()
+            datos_locales = self._leer_procesadas_locales([s['id'] for s in sanciones if s.get('id')])
+            
+            # Enriquecer sanciones
+            for sancion in sanciones:
+                if sancion['id'] in datos_locales:
+                    sancion.update(datos_locales[sancion['id']])
+                else:
+                    # Extraer usuario del comentario si no hay dato local
+                    comentario = sancion.get('comentarios_rrhh', '')
+                    if comentario and ' - ' in comentario:
+                        partes = comentario.split(' - ')
+                        if len(partes) >= 3:
+                            sancion['procesado_por'] = partes[-1]
+                            sancion['fecha_procesamiento'] = partes[-2]
                 
-                # Verificar qué columnas existen
-                cursor.execute("PRAGMA table_info(procesadas)")
-                columnas_existentes = [row[1] for row in cursor.fetchall()]
+        except Exception as e:
+            print(f"⚠️ Error enriqueciendo datos: {e}")
+    
+    def _leer_procesadas_locales(self, ids: List[str]) -> Dict[str, Dict]:
+        """Datos de procesamiento local de los ids indicados, en lotes de ENRIQUECER_LOTE_IDS"""
+        # Columnas según capacidades detectadas al iniciar (la base original no tiene tiempo)
+        columna_tiempo = 'tiempo_procesamiento' if self.capacidades.procesadas_extendida else 'NULL'
+        ids = list(dict.fromkeys(ids))
+        datos_locales = {}
+        
+        with self.db.conexion() as conn:
+            for i in range(0, len(ids), ENRIQUECER_LOTE_IDS):
+                lote = ids[i:i + ENRIQUECER_LOTE_IDS]
+                marcadores = ','.join('?' * len(lote))
+                filas = conn.execute(f'''
+                    SELECT id, usuario, fecha_proceso, {columna_tiempo}
+                    FROM procesadas
+                    WHERE id IN ({marcadores})
+                ''', lote).fetchall()
                 
-                # Query base
-                if 'tiempo_procesamiento' in columnas_existentes:
-                    cursor.execute('''
-                        SELECT id, usuario, fecha_proceso, tiempo_procesamiento
-                        FROM procesadas
-                    ''')
-                    datos_locales = {row[0]: {
+                for row in filas:
+                    datos_locales[row[0]] = {
                         'procesado_por': row[1], 
                         'fecha_procesamiento': row[2],
                         'tiempo_procesamiento': row[3]
-                    } for row in cursor.fetchall()}
-                else:
-                    # Base de datos original
-                    cursor.execute('''
-                        SELECT id, usuario, fecha_proceso
-                        FROM procesadas
-                    ''')
-                    datos_locales = {row[0]: {
-                        'procesado_por': row[1], 
-                        'fecha_procesamiento': row[2],
-                        'tiempo_procesamiento': None
-                    } for row in cursor.fetchall()}
-                
-                # Enriquecer sanciones
-                for sancion in sanciones:
-                    if sancion['id'] in datos_locales:
-                        sancion.update(datos_locales[sancion['id']])
-                    else:
-                        # Extraer usuario del comentario si no hay dato local
-                        comentario = sancion.get('comentarios_rrhh', '')
-                        if comentario and ' - ' in comentario:
-                            partes = comentario.split(' - ')
-                            if len(partes) >= 3:
-                                sancion['procesado_por'] = partes[-1]
-                                sancion['fecha_procesamiento'] = partes[-2]
-                
-        except Exception as e:
-            print(f"⚠️ Error enriqueciendo datos: {e}")
+                    }
+        
+        return datos_locales
     
     def categorizar_procesadas(self, sanciones: List[Dict]) -> Dict[str, List[Dict]]:
         """Organizar sanciones procesadas por categorías"""
         return self.categorizar_sanciones(sanciones)
     
-    def exportar_a_excel(self, sanciones: List[Dict], nombre_archivo: str = None) -> str:
-        """⚡ OPTIMIZADO: Exportar sanciones a Excel con mejor rendimiento"""
+    # Columnas de exportación: (encabezado, campo, ancho en Excel)
+    COLUMNAS_EXPORTACION = [
+        ('ID', 'id', 15), ('Empleado Cod', 'empleado_cod', 12), ('Empleado Nombre', 'empleado_nombre', 25),
+        ('Puesto', 'puesto', 20), ('Agente', 'agente', 15), ('Fecha', 'fecha', 12), ('Hora', 'hora', 10),
+        ('Tipo Sanción', 'tipo_sancion', 18), ('Observaciones', 'observaciones', 30), ('Status', 'status', 12),
+        ('Comentarios RRHH', 'comentarios_rrhh', 30), ('Procesado Por', 'procesado_por', 15),
+        ('Fecha Procesamiento', 'fecha_procesamiento', 18)
+    ]
+    
+    def exportar_historial(self, nombre_archivo: str, categoria: Optional[str] = None,
+                           seguimiento: Optional[SeguimientoProgreso] = None) -> Optional[str]:
+        """
+        📥 NUEVO: Exportar el historial completo de principio a fin en streaming
+        Páginas de Supabase -> enriquecidas con el historial local -> escritas al archivo al llegar.
+        El formato sale de la extensión (.xlsx, .csv o .jsonl); la memoria no depende del total.
+        """
+        paginas = self.iterar_procesadas(categoria, PAGINA_EXPORTACION, remoto=True)
+        return self.exportar_sanciones(paginas, nombre_archivo, seguimiento)
+    
+    def exportar_sanciones(self, sanciones: Iterable, nombre_archivo: str,
+                           seguimiento: Optional[SeguimientoProgreso] = None) -> Optional[str]:
+        """Exportar filas o páginas al formato indicado por la extensión del archivo"""
+        extension = os.path.splitext(nombre_archivo)[1].lower()
+        
+        if extension == '.csv':
+            return self.exportar_a_csv(sanciones, nombre_archivo, seguimiento)
+        if extension in ('.jsonl', '.ndjson'):
+            return self.exportar_a_jsonl(sanciones, nombre_archivo, seguimiento)
+        return self.exportar_a_excel(sanciones, nombre_archivo, seguimiento)
+    
+    def exportar_a_csv(self, sanciones: Iterable, nombre_archivo: str,
+                       seguimiento: Optional[SeguimientoProgreso] = None) -> Optional[str]:
+        """📥 NUEVO: Exportar a CSV (separador ';' y BOM para que Excel en español lo abra bien)"""
+        try:
+            print(f"📄 Exportando CSV: {nombre_archivo}")
+            total = 0
+            with open(nombre_archivo, 'w', newline='', encoding='utf-8-sig') as archivo:
+                writer = csv.writer(archivo, delimiter=';')
+                writer.writerow([header for header, _, _ in self.COLUMNAS_EXPORTACION])
+                
+                for sancion in self._filas_con_progreso(sanciones, seguimiento):
+                    writer.writerow([sancion.get(campo, '') for _, campo, _ in self.COLUMNAS_EXPORTACION])
+                    total += 1
+            
+            print(f"✅ CSV exportado exitosamente ({total} registros)")
+            return nombre_archivo
+            
+        except Exception as e:
+            print(f"❌ Error exportando a CSV: {e}")
+            return None
+    
+    def exportar_a_jsonl(self, sanciones: Iterable, nombre_archivo: str,
+                         seguimiento: Optional[SeguimientoProgreso] = None) -> Optional[str]:
+        """📥 NUEVO: Exportar a JSON Lines (un registro completo por línea)"""
+        try:
+            print(f"📄 Exportando JSON Lines: {nombre_archivo}")
+            total = 0
+            with open(nombre_archivo, 'w', encoding='utf-8') as archivo:
+                for sancion in self._filas_con_progreso(sanciones, seguimiento):
+                    archivo.write(json.dumps(sancion, ensure_ascii=False, default=str))
+                    archivo.write('\n')
+                    total += 1
+            
+            print(f"✅ JSON Lines exportado exitosamente ({total} registros)")
+            return nombre_archivo
+            
+        except Exception as e:
+            print(f"❌ Error exportando a JSON Lines: {e}")
+            return None
+    
+    def exportar_a_excel(self, sanciones: Iterable, nombre_archivo: str = None,
+                         seguimiento: Optional[SeguimientoProgreso] = None) -> str:
+        """
+        ⚡ OPTIMIZADO: Exportar sanciones a Excel con mejor rendimiento
+        Acepta una lista o un iterable de páginas/filas (p. ej. iterar_procesadas());
+        cada fila se agrega a su hoja al llegar, sin copias intermedias.
+        Libro write-only de openpyxl: las filas van a disco, la memoria no crece con el total.
+        """
         try:
             print("📥 Iniciando exportación optimizada a Excel...")
             
@@ -617,6 +2372,7 @@ class ProcesadorRRHH:
                 import openpyxl
                 from openpyxl.styles import Font, Alignment, PatternFill
                 from openpyxl.utils import get_column_letter
+                from openpyxl.cell import WriteOnlyCell
             except ImportError:
                 print("📦 Instalando openpyxl...")
                 import subprocess
@@ -625,6 +2381,7 @@ class ProcesadorRRHH:
                 import openpyxl
                 from openpyxl.styles import Font, Alignment, PatternFill
                 from openpyxl.utils import get_column_letter
+                from openpyxl.cell import WriteOnlyCell
         
             if not nombre_archivo:
                 timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -632,95 +2389,80 @@ class ProcesadorRRHH:
             
             print(f"📄 Creando archivo: {nombre_archivo}")
             
-            wb = openpyxl.Workbook()
-            categorizadas = self.categorizar_sanciones(sanciones)
+            wb = openpyxl.Workbook(write_only=True)
             
-            if 'Sheet' in wb.sheetnames:
-                wb.remove(wb['Sheet'])
+            # Estilos
+            header_font = Font(bold=True, color="FFFFFF")
+            header_fill = PatternFill(start_color="2E86AB", end_color="2E86AB", fill_type="solid")
+            header_alignment = Alignment(horizontal="center", vertical="center")
             
-            # Crear hojas por categoría
-            hojas_creadas = 0
-            for categoria, sanciones_categoria in categorizadas.items():
-                if not sanciones_categoria:
-                    continue
-                    
-                print(f"📋 Creando hoja: {categoria} ({len(sanciones_categoria)} registros)")
+            # Headers optimizados
+            headers = [header for header, _, _ in self.COLUMNAS_EXPORTACION]
+            column_widths = [ancho for _, _, ancho in self.COLUMNAS_EXPORTACION]
+            
+            orden_categorias = {categoria: i for i, categoria in enumerate(CATEGORIAS.keys())}
+            hojas = {}  # categoría -> hoja (se crean al llegar la primera fila)
+            conteos = {categoria: 0 for categoria in CATEGORIAS.keys()}
+            
+            def hoja_para(categoria):
+                if categoria in hojas:
+                    return hojas[categoria]
                 
+                # Mantener el orden de CATEGORIAS aunque las filas lleguen mezcladas
+                indice = sum(1 for c in hojas if orden_categorias[c] < orden_categorias[categoria])
                 nombre_hoja = categoria.replace('/', '-')[:30]
-                ws = wb.create_sheet(title=nombre_hoja)
-                
-                # Estilos
-                header_font = Font(bold=True, color="FFFFFF")
-                header_fill = PatternFill(start_color="2E86AB", end_color="2E86AB", fill_type="solid")
-                header_alignment = Alignment(horizontal="center", vertical="center")
+                ws = wb.create_sheet(title=nombre_hoja, index=indice)
                 
-                # Headers optimizados
-                headers = [
-                    'ID', 'Empleado Cod', 'Empleado Nombre', 'Puesto', 
-                    'Agente', 'Fecha', 'Hora', 'Tipo Sanción', 
-                    'Observaciones', 'Status', 'Comentarios RRHH', 
-                    'Procesado Por', 'Fecha Procesamiento'
-                ]
+                # Ajustar anchos (en write-only deben definirse antes de la primera fila)
+                for col, width in enumerate(column_widths, 1):
+                    ws.column_dimensions[get_column_letter(col)].width = width
                 
                 # Escribir headers
-                for col, header in enumerate(headers, 1):
-                    cell = ws.cell(row=1, column=col, value=header)
+                fila_header = []
+                for header in headers:
+                    cell = WriteOnlyCell(ws, value=header)
                     cell.font = header_font
                     cell.fill = header_fill
                     cell.alignment = header_alignment
+                    fila_header.append(cell)
+                ws.append(fila_header)
                 
-                # Escribir datos en lotes para mejor rendimiento
-                batch_data = []
-                for sancion in sanciones_categoria:
-                    row_data = [
-                        str(sancion.get('id', ''))[:12] + '...' if len(str(sancion.get('id', ''))) > 12 else str(sancion.get('id', '')),
-                        sancion.get('empleado_cod', ''),
-                        sancion.get('empleado_nombre', ''),
-                        sancion.get('puesto', ''),
-                        sancion.get('agente', ''),
-                        sancion.get('fecha', ''),
-                        sancion.get('hora', ''),
-                        sancion.get('tipo_sancion', ''),
-                        sancion.get('observaciones', ''),
-                        sancion.get('status', ''),
-                        sancion.get('comentarios_rrhh', ''),
-                        sancion.get('procesado_por', ''),
-                        sancion.get('fecha_procesamiento', '')
-                    ]
-                    batch_data.append(row_data)
-                
-                # Escribir todos los datos de una vez
-                for row_idx, row_data in enumerate(batch_data, 2):
-                    for col_idx, value in enumerate(row_data, 1):
-                        ws.cell(row=row_idx, column=col_idx, value=value)
-                
-                # Ajustar anchos
-                column_widths = [15, 12, 25, 20, 15, 12, 10, 18, 30, 12, 30, 15, 18]
-                for col, width in enumerate(column_widths, 1):
-                    ws.column_dimensions[get_column_letter(col)].width = width
+                print(f"📋 Creando hoja: {categoria}")
+                hojas[categoria] = ws
+                return ws
+            
+            total = 0
+            for sancion in self._filas_con_progreso(sanciones, seguimiento):
+                categoria = self.categoria_de_tipo(sancion.get('tipo_sancion'))
+                id_texto = str(sancion.get('id', ''))
                 
-                hojas_creadas += 1
+                fila = [sancion.get(campo, '') for _, campo, _ in self.COLUMNAS_EXPORTACION]
+                fila[0] = id_texto[:12] + '...' if len(id_texto) > 12 else id_texto
+                hoja_para(categoria).append(fila)
+                conteos[categoria] += 1
+                total += 1
             
             # Hoja resumen
-            if hojas_creadas > 0:
+            if hojas:
                 ws_resumen = wb.create_sheet(title="Resumen", index=0)
                 
-                ws_resumen['A1'] = "RESUMEN DE SANCIONES PROCESADAS"
-                ws_resumen['A1'].font = Font(size=16, bold=True)
+                titulo = WriteOnlyCell(ws_resumen, value="RESUMEN DE SANCIONES PROCESADAS")
+                titulo.font = Font(size=16, bold=True)
+                ws_resumen.append([titulo])
+                ws_resumen.append([])
                 
-                ws_resumen['A3'] = f"Fecha de generación: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
-                ws_resumen['A4'] = f"Total de sanciones: {len(sanciones)}"
+                ws_resumen.append([f"Fecha de generación: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"])
+                ws_resumen.append([f"Total de sanciones: {total}"])
+                ws_resumen.append([])
                 
-                row = 6
-                for categoria, sanciones_cat in categorizadas.items():
-                    if sanciones_cat:
-                        ws_resumen[f'A{row}'] = f"{categoria}: {len(sanciones_cat)} sanciones"
-                        row += 1
+                for categoria, cantidad in conteos.items():
+                    if cantidad:
+                        ws_resumen.append([f"{categoria}: {cantidad} sanciones"])
             else:
                 ws = wb.create_sheet(title="Sin Datos")
-                ws['A1'] = "No hay datos para exportar"
+                ws.append(["No hay datos para exportar"])
             
-            print(f"💾 Guardando archivo: {nombre_archivo}")
+            print(f"💾 Guardando archivo: {nombre_archivo} ({total} registros)")
             wb.save(nombre_archivo)
             print(f"✅ Excel exportado exitosamente")
             
@@ -731,11 +2473,37 @@ class ProcesadorRRHH:
             import traceback
             traceback.print_exc()
             return None
+    
+    def _aplanar_filas(self, sanciones: Iterable) -> Iterator[Dict]:
+        """Recorrer filas de una lista de sanciones o de un iterable de páginas"""
+        for elemento in sanciones:
+            if isinstance(elemento, list):
+                yield from elemento
+            else:
+                yield elemento
+    
+    def _filas_con_progreso(self, sanciones: Iterable,
+                            seguimiento: Optional[SeguimientoProgreso]) -> Iterator[Dict]:
+        """Aplanar filas registrando en `seguimiento` cada bloque de PAGINA_HISTORIAL filas escritas"""
+        bloque = 0
+        inicio_bloque = time.time()
+        for sancion in self._aplanar_filas(sanciones):
+            yield sancion
+            bloque += 1
+            if seguimiento and bloque == PAGINA_HISTORIAL:
+                latencia = (time.time() - inicio_bloque) / bloque
+                seguimiento.registrar(exitosas=bloque, latencias=[latencia] * bloque)
+                bloque = 0
+                inicio_bloque = time.time()
+        
+        if seguimiento and bloque:
+            latencia = (time.time() - inicio_bloque) / bloque
+            seguimiento.registrar(exitosas=bloque, latencias=[latencia] * bloque)
 
     def obtener_estadisticas(self) -> Dict:
         """⚡ OPTIMIZADO: Estadísticas del sistema"""
         try:
-            with sqlite3.connect(DB_LOCAL) as conn:
+            with self.db.conexion() as conn:
                 cursor = conn.cursor()
                 
                 # Estadísticas locales
@@ -806,11 +2574,10 @@ class ProcesadorRRHH:
                 "supervisor_id": "00000000-0000-0000-0000-000000000000"
             }
             
-            response = requests.post(
-                url, 
-                headers=self.supabase_headers, 
-                json=sancion_prueba,
-                timeout=REQUEST_TIMEOUT
+            response = self._supabase(
+                'POST',
+                url,
+                json=sancion_prueba
             )
             
             if response.status_code in [200, 201]:
@@ -824,5 +2591,65 @@ class ProcesadorRRHH:
             print(f"❌ Error creando sanción de prueba: {e}")
             return False
 
+class ProcesadorDiferido:
+    """
+    🚀 NUEVO: Instancia global creada en segundo plano y esperada en el primer uso
+    Al importar arranca la construcción de ProcesadorRRHH (ruta de la base, migraciones,
+    pool HTTP) en un hilo; cualquier atributo pedido bloquea solo hasta que esté lista.
+    """
+
+    def __init__(self, fabrica: Callable[[], ProcesadorRRHH]):
+        self._fabrica = fabrica
+        self._instancia = None
+        self._error = None
+        self._lista = threading.Event()
+        self.inicio = time.time()
+
+    def iniciar(self, en_segundo_plano: bool = INICIO_DIFERIDO):
+        if en_segundo_plano:
+            threading.Thread(target=self._crear, name="inicio-procesador", daemon=True).start()
+        else:
+            self._crear()
+
+    def _crear(self):
+        try:
+            self._instancia = self._fabrica()
+            tiempos = self._instancia.tiempos_inicio
+            print(f"⏱️ Procesador listo en {tiempos['total']:.2f}s "
+                  f"(ruta DB {tiempos['ruta_db']:.2f}s, migraciones {tiempos['migraciones']:.2f}s)")
+            self._instancia.log_operacion(
+                "sistema", "INICIO",
+                "Inicio diferido" if INICIO_DIFERIDO else "Inicio directo",
+                f"Ruta DB: {tiempos['ruta_db']:.2f}s, Migraciones: {tiempos['migraciones']:.2f}s, "
+                f"Total: {tiempos['total']:.2f}s"
+            )
+        except Exception as e:
+            self._error = e
+            print(f"❌ Error inicializando el procesador: {e}")
+        finally:
+            self._lista.set()
+
+    @property
+    def listo(self) -> bool:
+        return self._lista.is_set()
+
+    def esperar(self, timeout: Optional[float] = None) -> ProcesadorRRHH:
+        """Bloquear hasta que la instancia esté creada (relanza el error de inicio si lo hubo)"""
+        if not self._lista.wait(timeout):
+            raise TimeoutError("El procesador todavía se está inicializando")
+        if self._error is not None:
+            raise self._error
+        return self._instancia
+
+    def __getattr__(self, nombre):
+        return getattr(self.esperar(), nombre)
+
+    def cerrar(self):
+        """Hook de apagado: solo si la instancia llegó a crearse"""
+        if self._instancia is not None:
+            self._instancia.cerrar()
+
 # Instancia global
-procesador = ProcesadorRRHH()
+procesador = ProcesadorDiferido(ProcesadorRRHH)
+procesador.iniciar()
+atexit.register(procesador.cerrar)